@@ -1,18 +1,37 @@
+import os
+import time
+import random
+import signal
 import asyncio
-import aiohttp
 import logging
 import argparse
+from datetime import date
 import pandas as pd
 pd.set_option('future.no_silent_downcasting', True)
 
-from config import CITIES, MAX_CONCURRENCY
+from config import (
+    CITIES, MAX_CONCURRENCY, CSV_FILE, CSV_CHUNKSIZE, STATE_FILE, CACHE_FILE,
+    HOST_LIMITS, DEFAULT_HOST_LIMITS, SERVE_INTERVAL, SERVE_JITTER, STREAM_QUEUE_SIZE, STREAM_CHUNKSIZE,
+    WORKERS, WORKER_MIN_ROWS, METRICS_TEXTFILE, METRICS_SUMMARY, PROFILE_DIR
+)
 from utils.logging_utils import setup_daily_log
+from utils.checkpoint import Checkpoint
+from utils.response_cache import ResponseCache, use_cache
+from utils.scheduler import HostScheduler, ScheduledSession
+from utils.retry import RetryPolicy, use_retry_policy, retry_policy
+from utils.geocoding import gazetteer
+from utils.http_session import ConnectionStats, create_session
+from utils.metrics import RunMetrics, use_metrics, current_metrics
+from utils.profiling import Profiler
+from utils.sharding import ShardedExecutor
+from utils.merge_index import ReadingIndex, parse_timestamps
+from utils.schema import RecordBatch, conform, concat_frames
 from input_sources.weather_api import WeatherAPIInput
 from input_sources.air_quality_api import OpenAQInput, OpenMeteoInput
 from input_sources.csv_reader import CSVInput
 from transformations.transformer import TransformerPipeline
-from outputs.output_writer import CSVOutput, BlockedOutput, ConsoleOutput
-from utils.async_fileio import async_read_csv, async_write_csv
+from outputs.output_writer import CSVOutput, BlockedOutput, ConsoleOutput, ParquetOutput, HourlyAQIOutput, SQLiteOutput
+from utils.async_fileio import async_read_csv, async_iter_csv, async_write_csv, complete_lines_end, HISTORY_DTYPES
 
 from transformations.transformer import (
     kelvin_to_celsius, add_feels_like_temp, add_humidity_level,
@@ -29,108 +48,663 @@ TRANSFORMER_MAP = {
     "fill_missing": fill_missing
 }
 
+SOURCE_MAP = {
+    "weather": WeatherAPIInput,
+    "openaq": OpenAQInput,
+    "open-meteo": OpenMeteoInput
+}
+
+DESTINATION_MAP = {
+    "csv": CSVOutput,
+    "parquet": ParquetOutput,
+    "sqlite": SQLiteOutput,
+    "console": ConsoleOutput,
+    "blocked": BlockedOutput
+}
+
+# Queue sentinel: a stage forwards it downstream once all of its inputs are exhausted
+_DONE = object()
+# Pipeline stages timed in self.metrics; end_to_end is only measured by the streaming graph.
+# Sources, transformers and outputs are also timed one by one, as stages "source", "transformer" and "output".
+STAGES = ("fetch", "read", "merge", "transform", "write", "end_to_end")
+
 class AsyncDataPipeline:
     def __init__(
         self,
         sources,
         transformers=None,
         destinations=None,
-        max_concurrent_tasks=5
+        max_concurrent_tasks=5,
+        chunksize=None,
+        checkpoint=None,
+        full_refresh=False,
+        cache_file=None,
+        streaming=False,
+        queue_size=STREAM_QUEUE_SIZE,
+        workers=1,
+        hourly_output=None,
+        metrics_textfile=METRICS_TEXTFILE,
+        summary_file=METRICS_SUMMARY
     ):
         """
-        :param sources: List of callables that asynchronously collect data.
+        :param sources: List of input sources (see SOURCE_MAP). The source without
+            MERGE_ON provides the rows; the others are joined onto them by MERGE_ON.
         :param transformers: List of callables that transform or process data.
         :param destinations: List of callables that asynchronously send data.
-        :param max_concurrent_tasks: Maximum number of concurrent async tasks allowed.
+        :param max_concurrent_tasks: Maximum number of concurrent requests allowed per host.
+        :param chunksize: If set, stream the historical CSV in chunks of this many rows
+            and transform/write each chunk instead of loading the whole file.
+        :param checkpoint: Checkpoint used for incremental runs. If None, every run
+            reads and writes everything.
+        :param full_refresh: Clear the checkpoint and reset destinations before running.
+        :param cache_file: SQLite file of the API response cache. If None, every fetch hits the network.
+        :param streaming: Run fetch, merge, transform and write as concurrent stages
+            connected by bounded queues instead of one step after another.
+        :param queue_size: Capacity of each queue between stages in streaming mode.
+        :param workers: If above 1, run the transformers on city shards in this many
+            worker processes for frames of at least WORKER_MIN_ROWS rows.
+        :param hourly_output: Output of the hourly AQI table, fed by sources with an
+            hourly series (hourly_table). If None, the series is only used for joining.
+        :param metrics_textfile: Prometheus textfile rewritten with the metrics of every run or serve cycle.
+        :param summary_file: JSON file rewritten with the summary of every run or serve cycle.
         """
         self.sources = sources
         self.transformers = transformers if transformers else []
         self.destinations = destinations if destinations else []
         self.max_concurrent_tasks = max_concurrent_tasks
+        self.chunksize = chunksize
+        self.checkpoint = checkpoint
+        self.full_refresh = full_refresh
+        self.cache_file = cache_file
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.executor = ShardedExecutor(workers, WORKER_MIN_ROWS) if workers > 1 else None
+        self.hourly_output = hourly_output
+        self.metrics_textfile = metrics_textfile
+        self.summary_file = summary_file
+        self._csv_offset = 0
+        # Set when an output fails during a run or cycle, which then leaves the CSV offset where it was
+        self._write_failed = False
+        self.metrics = RunMetrics(STAGES)
 
     async def run(self):
+        """Runs one refresh of every city; returns rows written. Its metrics are left in self.metrics."""
+        await self._start()
+        cache, scheduler, connection_stats = self._open_clients()
+        self._start_metrics()
+        self._write_failed = False
+        rows = 0
+        try:
+            async with create_session(connection_stats) as client:
+                session = ScheduledSession(client, scheduler)
+                if self.streaming:
+                    rows = await self._run_graph(session, CITIES)
+                else:
+                    df_weather = await self._collect(session, CITIES)
+            if not self.streaming:
+                rows = await self._process(df_weather)
+            return rows
+        finally:
+            self._finish_metrics(rows)
+            self._close_clients(cache, scheduler, connection_stats)
+
+    async def serve(self, interval=SERVE_INTERVAL, jitter=SERVE_JITTER):
+        """
+        Runs continuously, refreshing each city every interval seconds until SIGTERM/SIGINT.
+
+        The event loop, HTTP session, response cache and the read position in the
+        historical CSV are kept across cycles. Each city is rescheduled with
+        +/- jitter (a fraction of interval) so refreshes do not fall into
+        lockstep with the upstream APIs. A cycle takes every city due within the
+        width of that jitter, so cities stay batched instead of drifting apart
+        into one cycle each. A cycle that raises is logged and counted as a
+        cycle_errors event, and its cities are retried on their next schedule;
+        only a stop signal ends the loop, after the current cycle has finished
+        its writes.
+        """
+        await self._start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on Windows event loops; Ctrl+C still interrupts
+        cache, scheduler, connection_stats = self._open_clients()
+        due = {city: 0.0 for city in CITIES}
+        # Cities due this much later still join the cycle, so jitter does not split them into cycles of one
+        window = 2 * jitter * interval
+        log_date, cycle, failures = date.today(), 0, 0
+        try:
+            async with create_session(connection_stats) as client:
+                session = ScheduledSession(client, scheduler)
+                while not stop.is_set():
+                    delay = min(due.values()) - time.monotonic()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(stop.wait(), timeout=delay)
+                            break
+                        except asyncio.TimeoutError:
+                            pass
+                    if date.today() != log_date:
+                        setup_daily_log()
+                        log_date = date.today()
+                    now = time.monotonic()
+                    cities = [city for city, at in due.items() if at <= now + window]
+                    cycle += 1
+                    self.retry_policy.budget.reset()
+                    self._start_metrics()
+                    self._write_failed = False
+                    start = time.perf_counter()
+                    try:
+                        if self.streaming:
+                            rows = await self._run_graph(session, cities)
+                        else:
+                            rows = await self._process(await self._collect(session, cities))
+                        if cache is not None:
+                            cache.flush()
+                    except Exception:
+                        # One bad cycle must not take the service down; its cities come round again
+                        failures += 1
+                        logging.exception(f"Cycle {cycle} failed ({failures} failed cycles so far)")
+                        self.metrics.count("cycle_errors")
+                        rows = None
+                    self._finish_metrics(rows)
+                    if rows is not None:
+                        logging.info(
+                            f"Cycle {cycle}: refreshed {len(cities)} cities, wrote {rows} rows "
+                            f"in {time.perf_counter() - start:.2f}s"
+                        )
+                    for city in cities:
+                        due[city] = time.monotonic() + interval * (1 + random.uniform(-jitter, jitter))
+        finally:
+            self._close_clients(cache, scheduler, connection_stats)
+        logging.info(f"Stopped serving after {cycle} cycles, {failures} failed")
+
+    async def _start(self):
         setup_daily_log()
-        semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
-        async with aiohttp.ClientSession() as session:
-            async def sem_task(coro):
-                async with semaphore:
-                    return await coro
-
-            # Collect data from all sources
-            api_tasks = [sem_task(WeatherAPIInput.fetch(session, city)) for city in CITIES]
-            aqi_tasks = [sem_task(OpenAQInput.fetch(session, city)) for city in CITIES]
-            aqi_meteo_tasks = [sem_task(OpenMeteoInput.fetch(session, city)) for city in CITIES]
-            all_results = await asyncio.gather(*(api_tasks + aqi_tasks + aqi_meteo_tasks), return_exceptions=True)
-
-        # Separate results
-        weather_results, aqi_results, aqi_meteo_results = [], [], []
-        for result in all_results:
-            if isinstance(result, Exception):
-                logging.error(f"Fetch failed after retries: {result}")
-            elif "aqi_open_meteo" in result:
-                aqi_meteo_results.append(result)
-            elif "aqi" in result:
-                aqi_results.append(result)
+        if self.checkpoint is not None:
+            self.checkpoint.load()
+            if self.full_refresh:
+                logging.info("Full refresh requested: clearing checkpoint and resetting outputs")
+                self.checkpoint.reset()
+                await asyncio.gather(
+                    *(dest.reset() for dest in [*self.destinations, self.hourly_output] if hasattr(dest, 'reset'))
+                )
+
+    def _open_clients(self):
+        cache = ResponseCache(self.cache_file) if self.cache_file else None
+        use_cache(cache)
+        # One retry budget and set of circuit breakers for every source and output of the run
+        self.retry_policy = RetryPolicy()
+        use_retry_policy(self.retry_policy)
+        # Locate every city up front (building the gazetteer index if it is stale) so gaps show at startup
+        located = gazetteer().locate(CITIES)
+        if len(located) < len(CITIES):
+            unknown = [city for city in CITIES if city not in located]
+            logging.warning(f"No coordinates for {len(unknown)} of {len(CITIES)} cities: {', '.join(unknown[:20])}")
+        # Each host gets its own rate limit and adaptive concurrency window, capped at max_concurrent_tasks
+        scheduler = HostScheduler(
+            {host: self._cap(limits) for host, limits in HOST_LIMITS.items()},
+            self._cap(DEFAULT_HOST_LIMITS)
+        )
+        return cache, scheduler, ConnectionStats()
+
+    def _close_clients(self, cache, scheduler, connection_stats):
+        use_cache(None)
+        use_retry_policy(None)
+        use_metrics(None)
+        self.retry_policy.log()
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
+        scheduler.log_throughput()
+        connection_stats.log()
+        if self.executor is not None:
+            self.executor.close()
+
+    def _start_metrics(self):
+        # Sources, the cache, the scheduler and retries count their events into the active run
+        self.metrics = RunMetrics(STAGES)
+        use_metrics(self.metrics)
+
+    def _finish_metrics(self, rows):
+        self.metrics.finish(rows)
+        self.metrics.log()
+        try:
+            if self.metrics_textfile:
+                self.metrics.write_prometheus(self.metrics_textfile)
+            if self.summary_file:
+                self.metrics.write_summary(self.summary_file)
+        except OSError as e:
+            logging.error(f"Could not export metrics: {e}")
+
+    def _fetches(self, session, cities):
+        """Yields (source, cities, coroutine): one fetch per city, or per batch for sources with fetch_batch."""
+        for source in self.sources:
+            if hasattr(source, 'fetch_batch'):
+                # Batched sources take many coordinates per request
+                size = getattr(source, 'BATCH_SIZE', len(cities)) or 1
+                for i in range(0, len(cities), size):
+                    batch = cities[i:i + size]
+                    yield source, batch, source.fetch_batch(session, batch)
+            else:
+                for city in cities:
+                    yield source, [city], source.fetch(session, city)
+
+    async def _collect(self, session, cities):
+        """Fetches every source for cities and merges them into one DataFrame of new rows."""
+        fetches = list(self._fetches(session, cities))
+
+        async def timed(source, group, coro):
+            started = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                elapsed = time.perf_counter() - started
+                self.metrics["fetch"].observe(elapsed, len(group))
+                self.metrics.stage("source", source.__name__).observe(elapsed, len(group))
+
+        all_results = await asyncio.gather(*(timed(*fetch) for fetch in fetches), return_exceptions=True)
+
+        # Separate results by source
+        records = {source: [] for source in self.sources}
+        for (source, _, _), result in zip(fetches, all_results):
+            for record in (result if isinstance(result, list) else [result]):
+                if isinstance(record, Exception):
+                    logging.error(f"Fetch failed after retries: {record}")
+                    self.metrics.stage("source", source.__name__).errors += 1
+                else:
+                    records[source].append(record)
+        await self._write_hourly(records)
+        start = time.perf_counter()
+        df = self._only_new(self._join(records))
+        self.metrics["merge"].observe(time.perf_counter() - start, len(df))
+        return df
+
+    def _join(self, records):
+        """Builds rows from the primary source's records and joins the other sources onto them."""
+        primary = [source for source in self.sources if source.MERGE_ON is None]
+        batch = RecordBatch(dict.fromkeys(field for source in primary for field in source.FIELDS))
+        for source in primary:
+            batch.extend(records[source])
+        if not len(batch):
+            return pd.DataFrame()
+        df_weather = batch.to_frame()
+        # Join the other sources onto the rows in one indexed pass each; observation times are parsed once
+        timestamps = parse_timestamps(df_weather['timestamp'])
+        for source in self.sources:
+            if source.MERGE_ON is None or not records[source]:
+                continue
+            if hasattr(source, 'readings'):
+                readings = source.readings(records[source])
             else:
-                weather_results.append(result)
-
-        df_weather = pd.DataFrame(weather_results)
-        df_aqi = pd.DataFrame(aqi_results)
-        df_aqi_meteo = pd.DataFrame(aqi_meteo_results)
-
-        # Merge AQI into weather DataFrame on city
-        if not df_aqi.empty:
-            df_weather = pd.merge(df_weather, df_aqi[['city', 'aqi']], on='city', how='left')
-        # Merge AQI Open-Meteo on city and date (from timestamp)
-        if not df_aqi_meteo.empty and not df_weather.empty:
-            df_weather['date'] = pd.to_datetime(df_weather['timestamp']).dt.date.astype(str)
-            df_aqi_meteo['date'] = pd.to_datetime(df_aqi_meteo['timestamp']).dt.date.astype(str)
-            df_weather = pd.merge(
-                df_weather,
-                df_aqi_meteo[['city', 'date', 'aqi_open_meteo']],
-                on=['city', 'date'],
-                how='left'
-            )
-            df_weather.drop(columns=['date'], inplace=True)
-
-        # Async read all CSV records and append to the weather DataFrame
+                readings = RecordBatch(('city', 'timestamp', *source.FIELDS)).extend(records[source]).to_frame()
+            index = _reading_index(source).build(readings)
+            for field, values in index.lookup(df_weather['city'], timestamps).items():
+                df_weather[field] = values
+        return df_weather
+
+    async def _write_hourly(self, records):
+        """Appends the hours not written yet from sources with an hourly series to the hourly AQI table."""
+        if self.hourly_output is None:
+            return
+        frames = [
+            source.hourly_table(records[source])
+            for source in self.sources if hasattr(source, 'hourly_table') and records.get(source)
+        ]
+        if not frames:
+            return
+        df = self._only_new(pd.concat(frames, ignore_index=True))
+        if df.empty:
+            return
+        if not await retry_output(self.hourly_output, df):
+            # The hours stay behind the high-water marks, so the next run fetches and appends them again
+            return
+        if self.checkpoint is not None:
+            self.checkpoint.advance(df)
+            self.checkpoint.save()
+        logging.info(f"Appended {len(df)} hourly AQI rows")
+
+    async def _process(self, df_weather):
+        """Appends new historical CSV rows to df_weather, transforms and writes them; returns rows written."""
+        if self.chunksize:
+            return await self._stream_history(df_weather)
+
+        # Async read all new CSV records and append to the weather DataFrame
+        end = None
         try:
-            csv_df = await async_read_csv("historical_weather_data.csv")
+            offset, end = self._csv_range()
+            start = time.perf_counter()
+            csv_df = await async_read_csv(CSV_FILE, offset=offset, end=end)
+            self.metrics["read"].observe(time.perf_counter() - start, len(csv_df), nbytes=end - offset)
         except Exception as e:
             logging.error(f"Async CSV read failed: {e}")
-            csv_df = pd.DataFrame()
+            csv_df, end = pd.DataFrame(), None
         if not csv_df.empty:
-            df_weather = pd.concat([df_weather, csv_df], ignore_index=True)
-        df_weather.sort_values(by=['city', 'timestamp'], ascending=[True, True], inplace=True)
+            df_weather = concat_frames([df_weather, csv_df])
+        if not df_weather.empty:
+            df_weather.sort_values(by=['city', 'timestamp'], ascending=[True, True], inplace=True)
+        rows = await self._transform_and_write(df_weather)
+        self._commit_csv(end)
+        return rows
+
+    async def _stream_history(self, df_weather):
+        """Writes the API rows, then transforms and writes the CSV history chunk by chunk."""
+        # Every chunk is reindexed to the same columns so appended CSV rows stay aligned
+        columns = list(dict.fromkeys([*df_weather.columns, *HISTORY_DTYPES]))
+        written = 0
+        if not df_weather.empty:
+            df_weather = conform(df_weather, columns)
+            df_weather.sort_values(by=['city', 'timestamp'], ascending=[True, True], inplace=True)
+            written += await self._transform_and_write(df_weather)
+        rows, end = 0, None
+        try:
+            offset, end = self._csv_range()
+            start = time.perf_counter()
+            async for chunk in async_iter_csv(CSV_FILE, chunksize=self.chunksize, offset=offset, end=end):
+                self.metrics["read"].observe(time.perf_counter() - start, len(chunk))
+                chunk = conform(chunk, columns)
+                chunk.sort_values(by=['city', 'timestamp'], ascending=[True, True], inplace=True)
+                written += await self._transform_and_write(chunk)
+                rows += len(chunk)
+                start = time.perf_counter()
+            self.metrics["read"].bytes += end - offset
+        except Exception as e:
+            logging.error(f"Async CSV stream failed: {e}")
+            end = None
+        logging.info(f"Streamed {rows} historical rows from {CSV_FILE} in chunks of {self.chunksize}")
+        self._commit_csv(end)
+        return written
+
+    async def _transform_and_write(self, df):
+        if df.empty:
+            logging.info("No new rows to transform or write")
+            return 0
+        start = time.perf_counter()
+        df, written = await self._transform(df)
+        self.metrics["transform"].observe(time.perf_counter() - start, len(df))
+        start = time.perf_counter()
+        rows = await self._write(df, written)
+        self.metrics["write"].observe(time.perf_counter() - start, rows)
+        return rows
+
+    async def _transform(self, df):
+        """Applies the transformers; also returns the checkpoint keys of the rows, taken before transforming."""
+        written = df.reindex(columns=['source', 'city', 'timestamp']) if self.checkpoint is not None else None
+
+        if self.executor is not None and self.transformers and self.executor.accepts(df):
+            try:
+                return await self.executor.transform(df, self.transformers), written
+            except Exception as e:
+                logging.error(f"Sharded transform failed, running in-process: {e}")
 
-        # Apply transformations with error handling
+        # Apply transformations with error handling, timing each one
         for transformer in self.transformers:
-            df_weather = safe_transform(transformer, df_weather)
+            start, rows_in = time.perf_counter(), len(df)
+            df = safe_transform(transformer, df)
+            self.metrics.stage("transformer", _name(transformer)).observe(time.perf_counter() - start, rows_in, len(df))
+        return df, written
 
+    async def _write(self, df, written):
+        """
+        Writes df to every destination; returns rows written.
+
+        The checkpoint only moves past the rows if every destination took them
+        (BEST_EFFORT ones aside). Otherwise they are all written again by the
+        next run, so outputs are at-least-once: an output that succeeded gets
+        them twice, unless it upserts like SQLiteOutput.
+        """
         # Dispatch to outputs with retry logic
-        await asyncio.gather(
-            *(retry_output(dest, df_weather) for dest in self.destinations)
+        results = await asyncio.gather(
+            *(retry_output(dest, df) for dest in self.destinations)
         )
+        failed = [
+            _name(dest) for dest, ok in zip(self.destinations, results)
+            if not ok and not getattr(dest, 'BEST_EFFORT', False)
+        ]
+        if failed:
+            self._write_failed = True
+            logging.error(f"Not checkpointing {len(df)} rows: {', '.join(failed)} failed; the next run writes them again")
+            return 0
+        if written is not None:
+            self.checkpoint.advance(written)
+            self.checkpoint.save()
+        return len(df)
+
+    async def _run_graph(self, session, cities):
+        """
+        Runs one cycle as a graph of concurrent stages joined by bounded queues; returns rows written.
+
+        sources -> merge -> transform -> sink: a city's row is merged as soon as
+        every source has answered for it and is transformed and written while
+        other cities are still being fetched. Historical CSV chunks enter at the
+        transform stage. A full queue blocks the stage feeding it, so memory stays
+        bounded and fetching slows to the pace of the writers.
+        """
+        fetched = asyncio.Queue(self.queue_size)
+        merged = asyncio.Queue(self.queue_size)
+        transformed = asyncio.Queue(self.queue_size)
+        metrics = self.metrics
+        # Every batch is reindexed to the same columns so appended CSV rows stay aligned
+        columns = list(dict.fromkeys([*(field for source in self.sources for field in source.FIELDS), *HISTORY_DTYPES]))
+        tasks = [
+            asyncio.create_task(self._source_stage(session, cities, fetched, metrics)),
+            asyncio.create_task(self._merge_stage(fetched, merged, metrics)),
+            asyncio.create_task(self._history_stage(merged, columns, metrics)),
+            asyncio.create_task(self._transform_stage(merged, transformed, columns, metrics, upstream=2)),
+            asyncio.create_task(self._sink_stage(transformed, metrics))
+        ]
+        try:
+            _, _, end, _, rows = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        self._commit_csv(end)
+        return rows
+
+    async def _source_stage(self, session, cities, fetched, metrics):
+        """Fetches all sources concurrently and queues one (source, city, record) per city as each returns."""
+        async def fetch(source, group, coro):
+            started = time.perf_counter()
+            try:
+                result = await coro
+            except Exception as e:
+                logging.error(f"Fetch failed after retries: {e}")
+                metrics.stage("source", source.__name__).errors += 1
+                result = []
+            elapsed = time.perf_counter() - started
+            metrics["fetch"].observe(elapsed, len(group))
+            metrics.stage("source", source.__name__).observe(elapsed, len(group))
+            by_city = {record["city"]: record for record in (result if isinstance(result, list) else [result])}
+            # A missing record still counts as the source's answer so the city is not held back
+            for city in group:
+                await _put(fetched, (source, city, by_city.get(city), started), metrics["fetch"])
+
+        await asyncio.gather(*(fetch(*spec) for spec in self._fetches(session, cities)))
+        await fetched.put(_DONE)
+
+    async def _merge_stage(self, fetched, merged, metrics):
+        """Joins the records of cities every source has answered for, in micro-batches of whatever has queued up."""
+        expected = len(set(self.sources))
+        hourly = {source: [] for source in self.sources if hasattr(source, 'hourly_table')}
+        pending = {}
+        finished = False
+        while not finished:
+            items = [await fetched.get()]
+            while not fetched.empty():
+                items.append(fetched.get_nowait())
+            start = time.perf_counter()
+            ready, oldest = {source: [] for source in self.sources}, None
+            for item in items:
+                if item is _DONE:
+                    finished = True
+                    continue
+                source, city, record, started = item
+                if source in hourly and record is not None:
+                    hourly[source].append(record)
+                parts, first = pending.setdefault(city, ({}, started))
+                parts[source] = record
+                if len(parts) < expected:
+                    continue
+                del pending[city]
+                for part_source, part in parts.items():
+                    if part is not None:
+                        ready[part_source].append(part)
+                oldest = first if oldest is None else min(oldest, first)
+            if oldest is None:
+                continue
+            df = self._only_new(self._join(ready))
+            metrics["merge"].observe(time.perf_counter() - start, len(df))
+            if not df.empty:
+                await _put(merged, (df, oldest), metrics["merge"])
+        await merged.put(_DONE)
+        await self._write_hourly(hourly)
+
+    async def _history_stage(self, merged, columns, metrics):
+        """Queues the new historical CSV rows chunk by chunk; returns the byte offset read up to."""
+        end = None
+        try:
+            offset, end = self._csv_range()
+            started = time.perf_counter()
+            chunks = async_iter_csv(CSV_FILE, chunksize=self.chunksize or STREAM_CHUNKSIZE, offset=offset, end=end)
+            async for chunk in chunks:
+                metrics["read"].observe(time.perf_counter() - started, len(chunk))
+                await _put(merged, (conform(chunk, columns), started), metrics["read"])
+                started = time.perf_counter()
+            metrics["read"].bytes += end - offset
+        except Exception as e:
+            logging.error(f"Async CSV stream failed: {e}")
+            end = None
+        await merged.put(_DONE)
+        return end
+
+    async def _transform_stage(self, merged, transformed, columns, metrics, upstream):
+        """Transforms in micro-batches of whatever queued up while the previous batch ran."""
+        finished = 0
+        while finished < upstream:
+            items = [await merged.get()]
+            while not merged.empty():
+                items.append(merged.get_nowait())
+            payloads = [item for item in items if item is not _DONE]
+            finished += len(items) - len(payloads)
+            if not payloads:
+                continue
+            start = time.perf_counter()
+            frames = [conform(frame, columns) for frame, _ in payloads]
+            df = concat_frames(frames)
+            if df.empty:
+                continue
+            df.sort_values(by=['city', 'timestamp'], ascending=[True, True], inplace=True)
+            df, written = await self._transform(df)
+            metrics["transform"].observe(time.perf_counter() - start, len(df))
+            oldest = min(started for _, started in payloads)
+            await _put(transformed, (df, written, oldest), metrics["transform"])
+        await transformed.put(_DONE)
+
+    async def _sink_stage(self, transformed, metrics):
+        """Writes each transformed batch to every destination in arrival order; returns rows written."""
+        rows = 0
+        while True:
+            item = await transformed.get()
+            if item is _DONE:
+                return rows
+            df, written, oldest = item
+            start = time.perf_counter()
+            rows += await self._write(df, written)
+            done = time.perf_counter()
+            metrics["write"].observe(done - start, len(df))
+            metrics["end_to_end"].observe(done - oldest, len(df))
+
+    def _cap(self, limits):
+        return {**limits, "max_concurrency": min(limits["max_concurrency"], self.max_concurrent_tasks)}
+
+    def _csv_range(self):
+        """Byte range of the historical CSV still to be read by this run or serve loop."""
+        if self.checkpoint is None:
+            size = os.path.getsize(CSV_FILE)
+            if self._csv_offset > size:
+                self._csv_offset = 0
+            return self._csv_offset, max(self._csv_offset, complete_lines_end(CSV_FILE, size))
+        return self.checkpoint.file_range(CSV_FILE)
+
+    def _only_new(self, df):
+        # Only for records from the APIs, which may return what was already written. CSV rows are
+        # bounded by the byte offset instead: a city's rows need not be in time order in the file
+        if self.checkpoint is None:
+            return df
+        return self.checkpoint.filter_new(df)
+
+    def _commit_csv(self, end):
+        if end is None or self._write_failed:
+            return
+        self._csv_offset = end
+        if self.checkpoint is not None:
+            self.checkpoint.commit_file(CSV_FILE, end)
+            self.checkpoint.save()
+
+def _reading_index(source):
+    return ReadingIndex(source.FIELDS, source.MERGE_ON, getattr(source, 'MERGE_TOLERANCE', None))
+
+async def _put(queue, item, metrics):
+    """Puts item on queue, charging the time spent waiting for space to the producing stage."""
+    start = time.perf_counter()
+    await queue.put(item)
+    metrics.blocked += time.perf_counter() - start
+
+def _name(obj):
+    return getattr(obj, '__name__', type(obj).__name__)
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
 
 def safe_transform(transformer, df):
     try:
         return transformer(df)
     except Exception as e:
         logging.error(f"Transformer {getattr(transformer, '__name__', str(transformer))} failed: {e}")
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.stage("transformer", _name(transformer)).errors += 1
         return df
 
-async def retry_output(dest, df, retries=3, delay=2):
-    for attempt in range(1, retries + 1):
-        try:
-            await dest.write(df)
-            return
-        except Exception as e:
-            logging.error(f"Output {getattr(dest, '__name__', str(dest))} failed (attempt {attempt}): {e}")
-            await asyncio.sleep(delay)
-    logging.error(f"All retries failed for output {getattr(dest, '__name__', str(dest))}")
+async def retry_output(dest, df):
+    """
+    Writes df to dest under the active RetryPolicy; returns whether the write succeeded.
+
+    Outputs raise on failure, so transient errors are retried and each output
+    type has its own circuit breaker; the final failure is logged here. The
+    write is timed as the output's stage of the active run; outputs with a
+    FILE report how much it grew as bytes written.
+    """
+    name = _name(dest)
+    path = getattr(dest, 'FILE', None)
+    size = _file_size(path)
+    start = time.perf_counter()
+    failed = False
+    try:
+        await retry_policy().call(f"output:{name}", dest.write, df)
+    except Exception as e:
+        logging.error(f"Output {name} failed: {e}")
+        failed = True
+    metrics = current_metrics()
+    if metrics is not None:
+        stage = metrics.stage("output", name)
+        stage.observe(time.perf_counter() - start, len(df), nbytes=max(0, _file_size(path) - size))
+        stage.errors += failed
+    return not failed
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Weather Data Pipeline")
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        default=list(SOURCE_MAP),
+        help="List of input sources: " + ", ".join(SOURCE_MAP)
+    )
     parser.add_argument(
         "--transformers",
         nargs="+",
@@ -145,19 +719,106 @@ if __name__ == "__main__":
         ],
         help="List of transformer function names to apply in order"
     )
+    parser.add_argument(
+        "--destinations",
+        nargs="+",
+        default=["csv", "console", "blocked"],
+        help="List of output destinations: " + ", ".join(DESTINATION_MAP)
+    )
     parser.add_argument(
         "--max-concurrency",
         type=int,
         default=MAX_CONCURRENCY,
-        help="Maximum number of concurrent tasks"
+        help="Maximum number of concurrent requests per host"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=CSV_CHUNKSIZE,
+        help="Stream the historical CSV in chunks of this many rows (0 loads it whole)"
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Ignore the incremental checkpoint and rebuild outputs from scratch"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk API response cache"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Keep running and refresh every city each --interval seconds until SIGTERM"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=SERVE_INTERVAL,
+        help="Seconds between refreshes of a city in --serve mode"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=SERVE_JITTER,
+        help="Random spread of each city's refresh, as a fraction of --interval"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Overlap fetching, transforming and writing as a pipelined graph of stages"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=STREAM_QUEUE_SIZE,
+        help="Capacity of each queue between stages in --streaming mode"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="Run the transformers in this many processes, sharded by city (1 runs them in-process)"
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=METRICS_TEXTFILE,
+        help="Write the run's metrics to this Prometheus textfile after every run or serve cycle"
+    )
+    parser.add_argument(
+        "--summary-json",
+        default=METRICS_SUMMARY,
+        help="Write a JSON summary of the run's metrics to this file after every run or serve cycle"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"Profile the run with cProfile and tracemalloc and save the report under {PROFILE_DIR}/"
     )
     args = parser.parse_args()
+    sources = [SOURCE_MAP[name] for name in args.sources if name in SOURCE_MAP]
     transformers = [TRANSFORMER_MAP[name] for name in args.transformers if name in TRANSFORMER_MAP]
-    destinations = [CSVOutput, ConsoleOutput, BlockedOutput]
+    destinations = [DESTINATION_MAP[name] for name in args.destinations if name in DESTINATION_MAP]
     pipeline = AsyncDataPipeline(
-        sources=[],  # Sources are handled inside the run method for this use case
+        sources=sources,
         transformers=transformers,
         destinations=destinations,
-        max_concurrent_tasks=args.max_concurrency
+        max_concurrent_tasks=args.max_concurrency,
+        chunksize=args.chunksize,
+        checkpoint=Checkpoint(STATE_FILE),
+        full_refresh=args.full_refresh,
+        cache_file=None if args.no_cache else CACHE_FILE,
+        streaming=args.streaming,
+        queue_size=args.queue_size,
+        workers=args.workers,
+        hourly_output=HourlyAQIOutput,
+        metrics_textfile=args.metrics_textfile,
+        summary_file=args.summary_json
     )
-    asyncio.run(pipeline.run())
\ No newline at end of file
+    main = pipeline.serve(args.interval, args.jitter) if args.serve else pipeline.run()
+    if args.profile:
+        with Profiler(PROFILE_DIR):
+            asyncio.run(main)
+    else:
+        asyncio.run(main)
\ No newline at end of file
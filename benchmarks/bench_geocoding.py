@@ -0,0 +1,76 @@
+"""
+Build and lookup times of the gazetteer index.
+
+Writes a synthetic GeoNames-style dump of --places places (with accented
+names and alternate names), builds the SQLite index from it and times
+lookups of --cities names, spelled with different case and without
+accents: once against the index, and again from the memo. Reopening an
+index that is up to date is checked to skip the rebuild. Files are written
+to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_geocoding --places 200000 --cities 10000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from utils.geocoding import Gazetteer
+
+SYLLABLES = ("sa", "lo", "ma", "ri", "to", "ké", "ba", "nu", "vé", "ça", "di", "go", "ra", "mi", "pé")
+
+def make_dump(path: str, places: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(places):
+            name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title() + f" {i}"
+            alternate = f"Alt {name}"
+            names.append(name)
+            f.write(
+                f"{i}\t{name}\t{name}\t{alternate}\t{rng.uniform(-90, 90):.5f}\t{rng.uniform(-180, 180):.5f}"
+                f"\tP\tPPL\tXX\t\t\t\t\t\t{rng.randint(0, 10_000_000)}\t\t\tEtc/UTC\t2024-01-01\n"
+            )
+    return names
+
+def unaccented(name: str) -> str:
+    return name.upper().replace("É", "E").replace("Ç", "C")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gazetteer index")
+    parser.add_argument("--places", type=int, default=200_000)
+    parser.add_argument("--cities", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump, db = os.path.join(tmp, "cities.txt"), os.path.join(tmp, "gazetteer.sqlite")
+        names = make_dump(dump, args.places)
+        cities = [unaccented(name) for name in random.Random(1).sample(names, min(args.cities, len(names)))]
+
+        gazetteer = Gazetteer(dump, db)
+        start = time.perf_counter()
+        gazetteer.build()
+        build = time.perf_counter() - start
+        gazetteer.close()
+        built_at = os.stat(db).st_mtime_ns
+
+        gazetteer = Gazetteer(dump, db)
+        start = time.perf_counter()
+        located = gazetteer.locate(cities)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        gazetteer.locate(cities)
+        memo = time.perf_counter() - start
+        gazetteer.close()
+        assert len(located) == len(cities), f"located {len(located)} of {len(cities)}"
+        assert os.stat(db).st_mtime_ns == built_at, "an up-to-date index was rebuilt"
+
+        print(f"places:            {args.places}")
+        print(f"build:             {build:.2f}s ({os.path.getsize(db) / 1e6:.1f} MB index)")
+        print(f"lookup (index):    {cold / len(cities) * 1e6:.1f} us/city, including opening the index")
+        print(f"lookup (memo):     {memo / len(cities) * 1e6:.2f} us/city")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
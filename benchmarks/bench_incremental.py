@@ -0,0 +1,85 @@
+"""
+Incremental reads of a growing historical CSV, as the checkpoint drives them.
+
+Writes --rows rows, then appends --append rows per round while the file
+grows. Each round the writer stops partway through its last row, as a
+process appending concurrently would, and the reader takes the byte range
+from Checkpoint.file_range, parses it and commits its end. The half-written
+row must be left for the next round, not parsed as a junk row or skipped;
+once the writer finishes it, the next round reads it whole. At the end the
+rows read must equal the rows written. Read time should follow the rows
+appended, not the size of the file.
+
+Usage:
+    python -m benchmarks.bench_incremental --rows 1000000 --append 10000 --rounds 10
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic import make_history
+from utils.async_fileio import async_read_csv
+from utils.checkpoint import Checkpoint
+
+def csv_lines(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False, header=False, lineterminator="\n").encode("utf-8")
+
+def read_new(checkpoint: Checkpoint, path: str):
+    offset, end = checkpoint.file_range(path)
+    start = time.perf_counter()
+    df = asyncio.run(async_read_csv(path, offset=offset, end=end))
+    elapsed = time.perf_counter() - start
+    checkpoint.commit_file(path, end)
+    return df, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental reads of an appended CSV")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the file before the first round")
+    parser.add_argument("--append", type=int, default=10_000, help="Rows appended per round")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.csv")
+        checkpoint = Checkpoint(os.path.join(tmp, "state.json"))
+        history = make_history(args.rows, seed=0)
+        history.to_csv(path, index=False, lineterminator="\n")
+        df, _ = read_new(checkpoint, path)
+        frames = [df]
+
+        written = [history]
+        pending = b""
+        print(f"{'round':>5} {'file MB':>8} {'rows read':>10} {'read s':>8}")
+        for round_ in range(args.rounds):
+            rows = make_history(args.append, seed=round_ + 1)
+            written.append(rows)
+            data = pending + csv_lines(rows)
+            # Stop in the middle of the last row; the rest is written after this round's read
+            cut = data.rstrip(b"\n").rfind(b"\n") + 1 + 5
+            pending = data[cut:]
+            with open(path, "ab") as f:
+                f.write(data[:cut])
+            df, elapsed = read_new(checkpoint, path)
+            expected = args.append - 1 + (1 if round_ else 0)
+            assert len(df) == expected, f"round {round_ + 1} read {len(df)} rows, expected {expected}"
+            assert df["source"].notna().all(), f"round {round_ + 1} parsed a half-written row"
+            frames.append(df)
+            print(f"{round_ + 1:>5} {os.path.getsize(path) / 1e6:>8.1f} {len(df):>10} {elapsed:>8.3f}")
+
+        with open(path, "ab") as f:
+            f.write(pending)
+        df, _ = read_new(checkpoint, path)
+        frames.append(df)
+        read = pd.concat(frames, ignore_index=True)
+        total = sum(len(frame) for frame in written)
+        assert len(read) == total, f"read {len(read)} rows in all, {total} were written"
+        expected = pd.to_datetime(pd.concat(written, ignore_index=True)["timestamp"])
+        assert (pd.to_datetime(read["timestamp"]).to_numpy() == expected.to_numpy()).all(), "rows read differ from rows written"
+        print(f"all {total} rows read once, in order")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Microbenchmark of the logging cost per fetch on the event loop thread.
+
+Logs one fetch line per simulated request from many concurrent tasks and
+reports the CPU time the event loop thread spends per line, for:
+
+- sync: a FileHandler on the root logger, as setup_daily_log used to attach;
+- queue text / queue json: setup_daily_log, a QueueHandler with the file
+  written by a background listener in batches;
+- sampled: queue json keeping 1% of the fetch lines;
+- downgraded: queue json with the fetch lines at DEBUG.
+
+wall us/fetch is the elapsed time per line instead; with the queue it also
+includes the listener thread's formatting when both share one core. drain s
+is the time the listener still needs after the loop is done to get every
+line to disk. Files are written to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_logging --fetches 100000
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+from utils.logging_utils import setup_daily_log, stop_log, log_fetch
+
+def setup_sync_log(filename: str):
+    handler = logging.FileHandler(filename, mode='a', encoding='utf-8')
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(logging.INFO)
+
+async def fetches(count: int, tasks: int):
+    async def worker(offset: int):
+        for i in range(offset, count, tasks):
+            started = time.perf_counter()
+            await asyncio.sleep(0)
+            log_fetch(f"Fetched weather for city-{i} from API", f"city-{i}", "api", started, status=200)
+
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    await asyncio.gather(*(worker(offset) for offset in range(tasks)))
+    return time.thread_time() - cpu_start, time.perf_counter() - start
+
+def baseline(count: int, tasks: int):
+    """Loop time with logging disabled, subtracted from every configuration."""
+    logging.getLogger().handlers.clear()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    return asyncio.run(fetches(count, tasks))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark logging overhead per fetch")
+    parser.add_argument("--fetches", type=int, default=100_000)
+    parser.add_argument("--tasks", type=int, default=100)
+    args = parser.parse_args()
+
+    configs = {
+        "sync": None,
+        "queue text": {"log_format": "text"},
+        "queue json": {"log_format": "json"},
+        "sampled": {"log_format": "json", "fetch_sample": 0.01},
+        "downgraded": {"log_format": "json", "fetch_level": "DEBUG"},
+    }
+    print(f"{'logging':>12} {'us/fetch':>9} {'wall us/fetch':>14} {'drain s':>8} {'lines':>8}")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            empty_cpu, empty_wall = baseline(args.fetches, args.tasks)
+            for name, options in configs.items():
+                for filename in os.listdir(tmp):
+                    os.remove(filename)
+                if options is None:
+                    setup_sync_log("sync.log")
+                else:
+                    setup_daily_log(**options)
+                cpu, wall = asyncio.run(fetches(args.fetches, args.tasks))
+                start = time.perf_counter()
+                if options is None:
+                    logging.getLogger().handlers[0].close()
+                else:
+                    stop_log()
+                drain = time.perf_counter() - start
+                lines = sum(sum(1 for _ in open(filename, encoding='utf-8')) for filename in os.listdir(tmp))
+                per_fetch = max(0.0, cpu - empty_cpu) / args.fetches * 1e6
+                wall_per_fetch = max(0.0, wall - empty_wall) / args.fetches * 1e6
+                print(f"{name:>12} {per_fetch:>9.2f} {wall_per_fetch:>14.2f} {drain:>8.3f} {lines:>8}")
+        finally:
+            logging.getLogger().handlers.clear()
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
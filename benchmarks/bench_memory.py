@@ -0,0 +1,96 @@
+"""
+Benchmark of the typed record schema against the previous untyped frames.
+
+Measures memory per million rows, and build time, two ways:
+
+- records: source records (dicts, "NA" for a missing AQI) turned into a
+  frame with pd.DataFrame, as the pipeline used to do, against RecordBatch;
+- history: the historical CSV read with the previous str/float64 dtypes
+  against HISTORY_DTYPES plus conform().
+
+Memory is the deep memory_usage of the resulting frame, so object columns
+are charged for the Python strings they point to. The typed frames are
+checked to write the same CSV text as the untyped ones.
+
+Usage:
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import io
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_history
+from utils.async_fileio import HISTORY_DTYPES
+from utils.schema import RecordBatch, conform, output_ready
+
+LEGACY_DTYPES = {
+    "city": str,
+    "temp_k": "float64",
+    "humidity": "float64",
+    "wind_speed": "float64",
+    "description": str,
+    "timestamp": str,
+    "source": str,
+}
+
+FIELDS = ("city", "temp_k", "humidity", "wind_speed", "description", "feels_like", "source", "timestamp", "aqi")
+
+def make_records(rows: int, seed: int = 0):
+    df = make_history(rows, seed=seed)
+    rng = np.random.default_rng(seed)
+    df["feels_like"] = np.round(df["temp_k"] - 1.5, 2)
+    df["source"] = "api"
+    df["timestamp"] = df["timestamp"] + ".123456"
+    # The weather API sends None for a missing value, OpenAQ used "NA"
+    df = df.astype(object).where(df.notna(), None)
+    aqi = np.round(rng.uniform(0, 150, rows), 1).astype(object)
+    aqi[rng.random(rows) < 0.2] = "NA"
+    df["aqi"] = pd.Series(aqi, index=df.index, dtype=object)
+    return df[list(FIELDS)].to_dict("records")
+
+def megabytes_per_million(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / len(df) * 1_000_000 / 1e6
+
+def as_csv(df: pd.DataFrame) -> str:
+    return output_ready(df).to_csv(index=False, na_rep="NA")
+
+def timed(build):
+    start = time.perf_counter()
+    df = build()
+    return df, time.perf_counter() - start
+
+def report(label: str, legacy: pd.DataFrame, legacy_s: float, typed: pd.DataFrame, typed_s: float):
+    before, after = megabytes_per_million(legacy), megabytes_per_million(typed)
+    print(f"{label:>8} {'untyped':>8} {before:>12.1f} {legacy_s:>9.3f}")
+    print(f"{label:>8} {'typed':>8} {after:>12.1f} {typed_s:>9.3f}   {before / after:.1f}x smaller")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory of the typed record schema")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--parity-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    csv_text = make_history(args.rows).to_csv(index=False)
+
+    sample = records[:args.parity_rows]
+    assert as_csv(pd.DataFrame(sample)) == as_csv(RecordBatch(FIELDS).extend(sample).to_frame()), "records differ"
+    sample_csv = make_history(args.parity_rows).to_csv(index=False)
+    legacy_sample = pd.read_csv(io.StringIO(sample_csv), dtype=LEGACY_DTYPES)
+    typed_sample = conform(pd.read_csv(io.StringIO(sample_csv), dtype=HISTORY_DTYPES))
+    assert as_csv(legacy_sample) == as_csv(typed_sample), "history differs"
+    print(f"parity ok on {args.parity_rows} rows")
+
+    print(f"{'input':>8} {'schema':>8} {'MB/1M rows':>12} {'build s':>9}")
+    legacy, legacy_s = timed(lambda: pd.DataFrame(records))
+    typed, typed_s = timed(lambda: RecordBatch(FIELDS, capacity=len(records)).extend(records).to_frame())
+    report("records", legacy, legacy_s, typed, typed_s)
+    legacy, legacy_s = timed(lambda: pd.read_csv(io.StringIO(csv_text), dtype=LEGACY_DTYPES))
+    typed, typed_s = timed(lambda: conform(pd.read_csv(io.StringIO(csv_text), dtype=HISTORY_DTYPES)))
+    report("history", legacy, legacy_s, typed, typed_s)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
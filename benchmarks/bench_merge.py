@@ -0,0 +1,127 @@
+"""
+Benchmark of the indexed AQI merge against pd.merge and pd.merge_asof.
+
+Generates hourly AQI readings for many cities and weather observations at
+random times, then joins them three ways:
+
+- pd.merge on (city, date) with the date derived by parsing both timestamp
+  columns, as the pipeline used to do;
+- pd.merge_asof by city with direction="backward", the pandas as-of join;
+- ReadingIndex, exact on (city, date) and as-of within a tolerance.
+
+The as-of results are checked against pd.merge_asof and the exact results
+against the latest reading per (city, date). Before timing, an hourly series
+running into the forecast checks that the as-of join never takes a reading
+later than the observation.
+
+Usage:
+    python -m benchmarks.bench_merge --cities 1000 10000 --hours 168 --rows-per-city 24
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from utils.merge_index import ReadingIndex, parse_timestamps
+
+START = pd.Timestamp("2025-01-01")
+
+def make_readings(cities: int, hours: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = np.array([f"city-{i}" for i in range(cities)], dtype=object)
+    # A few hours are missing, as in real hourly series
+    keep = rng.random(cities * hours) > 0.05
+    return pd.DataFrame({
+        "city": np.repeat(names, hours)[keep],
+        "timestamp": (START + pd.to_timedelta(np.tile(np.arange(hours), cities)[keep], unit="h")).strftime("%Y-%m-%dT%H:%M:%S"),
+        "aqi_open_meteo": np.round(rng.uniform(0, 150, cities * hours), 1)[keep],
+    })
+
+def make_weather(cities: int, hours: int, rows_per_city: int, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = cities * rows_per_city
+    return pd.DataFrame({
+        "city": np.array([f"city-{i}" for i in range(cities)], dtype=object)[rng.integers(0, cities, rows)],
+        "timestamp": (START + pd.to_timedelta(rng.integers(0, hours * 3600, rows), unit="s")).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "temp_k": rng.uniform(250, 315, rows),
+    })
+
+def legacy_merge(weather: pd.DataFrame, readings: pd.DataFrame) -> pd.DataFrame:
+    weather, readings = weather.copy(), readings.copy()
+    weather['date'] = pd.to_datetime(weather['timestamp']).dt.date.astype(str)
+    readings['date'] = pd.to_datetime(readings['timestamp']).dt.date.astype(str)
+    merged = pd.merge(weather, readings[['city', 'date', 'aqi_open_meteo']], on=['city', 'date'], how='left')
+    return merged.drop(columns=['date'])
+
+def pandas_asof(weather: pd.DataFrame, readings: pd.DataFrame, tolerance: int) -> np.ndarray:
+    left = weather.assign(ts=pd.to_datetime(weather['timestamp']), row=np.arange(len(weather))).sort_values('ts')
+    right = readings.assign(ts=pd.to_datetime(readings['timestamp'])).sort_values('ts')
+    merged = pd.merge_asof(
+        left, right[['ts', 'city', 'aqi_open_meteo']], on='ts', by='city',
+        direction='backward', tolerance=pd.Timedelta(seconds=tolerance)
+    )
+    result = np.full(len(weather), np.nan)
+    result[merged['row'].to_numpy()] = merged['aqi_open_meteo'].to_numpy()
+    return result
+
+def indexed(weather: pd.DataFrame, readings: pd.DataFrame, on, tolerance) -> np.ndarray:
+    index = ReadingIndex(["aqi_open_meteo"], on, tolerance).build(readings)
+    values = index.lookup(weather['city'], parse_timestamps(weather['timestamp']))
+    return values["aqi_open_meteo"].astype(float)
+
+def check_no_forecast(tolerance: int):
+    # Hours 00-23 with value = hour; the hours after each observation are forecasts
+    readings = pd.DataFrame({
+        "city": "city-0",
+        "timestamp": (START + pd.to_timedelta(np.arange(24), unit="h")).strftime("%Y-%m-%dT%H:%M:%S"),
+        "aqi_open_meteo": np.arange(24, dtype=float),
+    })
+    weather = pd.DataFrame({
+        "city": ["city-0", "city-0", "city-0", "city-1"],
+        "timestamp": [f"{START.date()}T10:40:00", f"{START.date()}T11:00:00", f"{START.date()}T00:00:00",
+                      f"{START.date()}T10:40:00"],
+    })
+    values = indexed(weather, readings, ("city",), tolerance)
+    assert same(np.array([10.0, 11.0, 0.0, np.nan]), values), f"as-of join used a later reading: {values}"
+    early = pd.DataFrame({"city": ["city-0"], "timestamp": [f"{(START - pd.Timedelta(minutes=20)).isoformat()}"]})
+    assert np.isnan(indexed(early, readings, ("city",), tolerance)[0]), "row before the first reading got a value"
+
+def latest_per_day(weather: pd.DataFrame, readings: pd.DataFrame) -> np.ndarray:
+    latest = readings.assign(date=pd.to_datetime(readings['timestamp']).dt.date).groupby(['city', 'date'])['aqi_open_meteo'].last()
+    keys = pd.MultiIndex.from_arrays([weather['city'], pd.to_datetime(weather['timestamp']).dt.date])
+    return latest.reindex(keys).to_numpy(dtype=float)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def same(expected: np.ndarray, actual: np.ndarray) -> bool:
+    return bool(((expected == actual) | (np.isnan(expected) & np.isnan(actual))).all())
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the indexed AQI merge")
+    parser.add_argument("--cities", nargs="+", type=int, default=[1_000, 10_000])
+    parser.add_argument("--hours", type=int, default=168)
+    parser.add_argument("--rows-per-city", type=int, default=24)
+    parser.add_argument("--tolerance", type=int, default=3600, help="As-of tolerance in seconds")
+    args = parser.parse_args()
+
+    check_no_forecast(args.tolerance)
+    print(f"{'cities':>8} {'readings':>10} {'rows':>10} {'pd.merge s':>11} {'merge_asof s':>13} "
+          f"{'index exact s':>14} {'index asof s':>13}")
+    for cities in args.cities:
+        readings = make_readings(cities, args.hours)
+        weather = make_weather(cities, args.hours, args.rows_per_city)
+        _, legacy = timed(legacy_merge, weather, readings)
+        expected_asof, pandas_time = timed(pandas_asof, weather, readings, args.tolerance)
+        exact, exact_time = timed(indexed, weather, readings, ("city", "date"), None)
+        asof, asof_time = timed(indexed, weather, readings, ("city",), args.tolerance)
+        assert same(expected_asof, asof), "as-of join differs from pd.merge_asof"
+        assert same(latest_per_day(weather, readings), exact), "exact join differs from the latest reading per day"
+        print(f"{cities:>8} {len(readings):>10} {len(weather):>10} {legacy:>11.3f} {pandas_time:>13.3f} "
+              f"{exact_time:>14.3f} {asof_time:>13.3f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+Request-count check and timing for batched Open-Meteo fetches.
+
+Starts a local aiohttp stub of the Open-Meteo air-quality endpoint, fetches
+every city with a known location per-city and in batches, and checks that the
+number of HTTP requests drops by the batch factor. The stub's pm2_5 value is
+derived from each location's latitude, so a batched or fallback record that
+differs from the per-city record of its city was matched to the wrong
+location. A second stub that rejects multi-location requests checks the
+per-city fallback.
+
+Usage:
+    python -m benchmarks.bench_openmeteo_batch --batch-size 5 --latency 0.05
+"""
+import math
+import time
+import asyncio
+import argparse
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.stub_server import StubServer
+from config import CITIES
+from input_sources.air_quality_api import OpenMeteoInput
+from utils.geocoding import gazetteer
+
+class OpenMeteoStub(StubServer):
+    """Local stand-in for the Open-Meteo air-quality endpoint that counts requests."""
+    PATH = "/v1/air-quality"
+
+    def __init__(self, latency: float = 0.0, reject_batches: bool = False):
+        super().__init__()
+        self.latency = latency
+        self.reject_batches = reject_batches
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        latitudes = request.query["latitude"].split(",")
+        if self.reject_batches and len(latitudes) > 1:
+            return web.json_response({"error": True, "reason": "batch rejected"}, status=400)
+        locations = [
+            {"latitude": float(lat), "hourly": {"time": ["2025-05-10T00:00"], "pm2_5": [pm2_5(lat)]}}
+            for lat in latitudes
+        ]
+        return web.json_response(locations if len(locations) > 1 else locations[0])
+
+def pm2_5(latitude: str) -> float:
+    # Distinct per location, so every record can be traced back to the location it was read for
+    return round(abs(float(latitude)) + 1.0, 4)
+
+def values(records):
+    return {r["city"]: r["aqi_open_meteo"] for r in records}
+
+async def fetch_per_city(session, cities, url):
+    return await asyncio.gather(*(OpenMeteoInput.fetch(session, city, url) for city in cities))
+
+async def fetch_batched(session, cities, url, batch_size):
+    batches = [cities[i:i + batch_size] for i in range(0, len(cities), batch_size)]
+    results = await asyncio.gather(*(OpenMeteoInput.fetch_batch(session, batch, url) for batch in batches))
+    return [record for batch in results for record in batch]
+
+async def main_async(batch_size: int, latency: float):
+    cities = list(gazetteer().locate(CITIES))
+    async with aiohttp.ClientSession() as session:
+        async with OpenMeteoStub(latency) as stub:
+            start = time.perf_counter()
+            per_city = await fetch_per_city(session, cities, stub.url)
+            per_city_time, per_city_requests = time.perf_counter() - start, stub.requests
+
+            stub.requests = 0
+            start = time.perf_counter()
+            batched = await fetch_batched(session, cities, stub.url, batch_size)
+            batched_time, batched_requests = time.perf_counter() - start, stub.requests
+
+        expected = math.ceil(len(cities) / batch_size)
+        assert per_city_requests == len(cities), per_city_requests
+        assert batched_requests == expected, f"expected {expected} batched requests, got {batched_requests}"
+        assert sorted(r["city"] for r in batched) == sorted(r["city"] for r in per_city)
+        assert all(r["aqi_open_meteo"] is not None for r in per_city), "per-city fetch lost a value"
+        assert values(batched) == values(per_city), "batched values differ from the per-city values"
+        print(f"per-city: {per_city_requests:>4} requests in {per_city_time:.3f}s")
+        print(f"batched:  {batched_requests:>4} requests in {batched_time:.3f}s (batch size {batch_size})")
+
+        async with OpenMeteoStub(latency, reject_batches=True) as stub:
+            fallback = await fetch_batched(session, cities, stub.url, batch_size)
+        assert stub.requests == expected + len(cities), stub.requests
+        assert values(fallback) == values(per_city), "fallback values differ from the per-city values"
+        print(f"fallback: {stub.requests:>4} requests ({expected} rejected batches + {len(cities)} per-city)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check batched Open-Meteo fetches against a local stub")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub response latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.batch_size, args.latency))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
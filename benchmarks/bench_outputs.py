@@ -0,0 +1,91 @@
+"""
+Benchmark of CSVOutput against ParquetOutput.
+
+Measures write time, size on disk, and the time to read back two columns
+for a single city, which is the typical analytics query.
+
+Usage:
+    python -m benchmarks.bench_outputs --rows 100000 1000000
+"""
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic import make_history
+from outputs.output_writer import CSVOutput, ParquetOutput
+from transformations.transformer import (
+    kelvin_to_celsius, add_feels_like_temp, add_humidity_level,
+    add_weather_score, add_is_rainy, clean_description, fill_missing
+)
+
+CHAIN = [
+    kelvin_to_celsius, add_feels_like_temp, add_humidity_level,
+    add_weather_score, add_is_rainy, clean_description, fill_missing
+]
+READ_COLUMNS = ['timestamp', 'temp_celsius']
+
+def disk_usage(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
+
+def read_city_csv(path: str, city: str) -> pd.DataFrame:
+    df = pd.read_csv(path, usecols=['city', *READ_COLUMNS])
+    return df.loc[df['city'] == city, READ_COLUMNS]
+
+def read_city_parquet(path: str, city: str) -> pd.DataFrame:
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    return dataset.to_table(columns=READ_COLUMNS, filter=ds.field('city') == city).to_pandas()
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def bench(rows: int, workdir: str, compression: str, row_group_size: int, date_formats):
+    df = make_history(rows)
+    for transformer in CHAIN:
+        df = transformer(df)
+    city = df['city'].iloc[0]
+    csv_path = os.path.join(workdir, f"out-{rows}.csv")
+    _, csv_write = timed(asyncio.run, CSVOutput.write(df, csv_path))
+    csv_rows, csv_read = timed(read_city_csv, csv_path, city)
+    print(f"{rows:>10} {'csv':>20} {csv_write:>9.3f} {disk_usage(csv_path) / 1e6:>9.2f} {csv_read:>9.3f}")
+    os.remove(csv_path)
+
+    for date_format in date_formats:
+        parquet_path = os.path.join(workdir, f"out-{rows}-parquet")
+        _, parquet_write = timed(
+            asyncio.run, ParquetOutput.write(df, parquet_path, compression, row_group_size, date_format)
+        )
+        parquet_rows, parquet_read = timed(read_city_parquet, parquet_path, city)
+        assert len(csv_rows) == len(parquet_rows), "CSV and Parquet disagree on the selected rows"
+        label = f"parquet {date_format}"
+        print(f"{rows:>10} {label:>20} {parquet_write:>9.3f} {disk_usage(parquet_path) / 1e6:>9.2f} {parquet_read:>9.3f}")
+        shutil.rmtree(parquet_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet outputs")
+    parser.add_argument("--rows", nargs="+", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--compression", default="zstd")
+    parser.add_argument("--row-group-size", type=int, default=128_000)
+    parser.add_argument("--date-formats", nargs="+", default=["%Y-%m-%d", "%Y-%m"],
+                        help="Date partition granularities to compare")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'format':>20} {'write s':>9} {'size MB':>9} {'read s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in args.rows:
+            bench(rows, workdir, args.compression, args.row_group_size, args.date_formats)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+End-to-end benchmark of AsyncDataPipeline.run against local mocks of the APIs.
+
+Starts benchmarks.mock_apis with the given latency, error rate and payload
+size, writes a synthetic historical CSV of --rows rows and a gazetteer for
+--cities synthetic cities into a temporary directory, and runs the pipeline
+there in a child process with every source pointed at the mock. The child
+is a fresh interpreter, so its peak RSS is the pipeline's alone; worker
+processes are reported separately.
+
+The report is JSON: wall time, rows written, throughput, peak RSS, the
+per-stage timings and event counters of pipeline.metrics and the requests the mock served. It
+carries the commit it was run on, so reports can be compared across commits.
+
+Usage:
+    python -m benchmarks.bench_pipeline --cities 500 --rows 200000 --latency 0.05 --output report.json
+    python -m benchmarks.bench_pipeline --streaming --error-rate 0.05 --payload-bytes 4096
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import platform
+import subprocess
+import tempfile
+from typing import Optional
+
+from benchmarks.mock_apis import MockAPIs
+from benchmarks.synthetic import make_history
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_child(args):
+    """Runs the pipeline once; config has already been read from the environment set by the parent."""
+    from config import HOST_LIMITS, STATE_FILE, OPENWEATHER_URL
+    from urllib.parse import urlsplit
+    import asyncpipeline as ap
+    from utils.checkpoint import Checkpoint
+
+    # The mock has no quota: only the concurrency cap applies
+    HOST_LIMITS[urlsplit(OPENWEATHER_URL).hostname] = {"rate": 1e9, "burst": 10 ** 9, "max_concurrency": args.concurrency}
+    pipeline = ap.AsyncDataPipeline(
+        sources=[ap.SOURCE_MAP[name] for name in args.sources],
+        transformers=list(ap.TRANSFORMER_MAP.values()),
+        destinations=[ap.DESTINATION_MAP[name] for name in args.destinations],
+        max_concurrent_tasks=args.concurrency,
+        chunksize=args.chunksize,
+        checkpoint=Checkpoint(STATE_FILE),
+        cache_file=None,
+        streaming=args.streaming,
+        workers=args.workers,
+        hourly_output=ap.HourlyAQIOutput
+    )
+    start = time.perf_counter()
+    rows = await pipeline.run()
+    wall = time.perf_counter() - start
+    summary = pipeline.metrics.summary()
+    print(json.dumps({
+        "wall_s": round(wall, 4),
+        "rows_written": rows,
+        "rows_per_s": round(rows / wall, 1) if wall else None,
+        "peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "workers_peak_rss_mb": round(_peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "stages": summary["stages"],
+        "counters": summary["counters"],
+    }))
+
+def write_inputs(tmp: str, cities: int, rows: int, seed: int):
+    names = [f"Bench City {i:05d}" for i in range(cities)]
+    with open(os.path.join(tmp, "gazetteer.csv"), "w", encoding="utf-8") as f:
+        f.write("name,latitude,longitude,population\n")
+        f.writelines(f"{name},{-60 + i % 120 + 0.5},{-170 + i % 340 + 0.5},{i}\n" for i, name in enumerate(names))
+    # In time order, as the file grows in production
+    history = make_history(rows, cities=names, seed=seed).sort_values("timestamp", kind="stable")
+    history.to_csv(os.path.join(tmp, "historical_weather_data.csv"), index=False)
+    return names
+
+async def run_parent(args, tmp: str, names):
+    async with MockAPIs(args.latency, args.jitter, args.error_rate, args.payload_bytes, seed=args.seed) as mock:
+        env = {
+            **os.environ,
+            **mock.urls(),
+            "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+            "CITIES": ",".join(names),
+            "CSV_FILE": "historical_weather_data.csv",
+            "GAZETTEER_CSV": "gazetteer.csv",
+            "GAZETTEER_DB": "gazetteer.sqlite",
+        }
+        child_args = [arg for arg in sys.argv[1:] if arg != "--child"]
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.bench_pipeline", "--child", *child_args,
+            cwd=tmp, env=env, stdout=asyncio.subprocess.PIPE
+        )
+        stdout, _ = await proc.communicate()
+        if proc.returncode != 0:
+            raise SystemExit(f"pipeline run failed with exit code {proc.returncode}")
+        result = json.loads(stdout.decode().strip().splitlines()[-1])
+        requests, errors = dict(mock.requests), dict(mock.errors)
+    return {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("child", "output")},
+        **result,
+        "cities_per_s": round(len(names) / result["wall_s"], 1) if result["wall_s"] else None,
+        "requests": requests,
+        "injected_errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local API mocks")
+    parser.add_argument("--cities", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=200_000, help="Rows in the synthetic historical CSV")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean mock response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency spread as a fraction of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock responses that are 503")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="Padding added to every mock response")
+    parser.add_argument("--sources", nargs="+", default=["weather", "openaq", "open-meteo"])
+    parser.add_argument("--destinations", nargs="+", default=["csv"])
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent requests per host")
+    parser.add_argument("--chunksize", type=int, default=0)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        names = write_inputs(tmp, args.cities, args.rows, args.seed)
+        report = asyncio.run(run_parent(args, tmp, names))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Request count and time to give up or recover, with the fixed retry loop the
+fetches used to have and with RetryPolicy.
+
+Starts a local aiohttp stub of the Open-Meteo air-quality endpoint and
+fetches every city concurrently in two scenarios:
+
+- down: every request is answered with 503;
+- flaky: a random 20% of requests are answered with 503.
+
+fixed retries every error three times, two seconds apart, as async_retry
+did. policy is RetryPolicy with its defaults from config.py: jittered
+exponential backoff, a retry budget and a circuit breaker for the host.
+
+Usage:
+    python -m benchmarks.bench_retry --cities 200
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.stub_server import StubServer
+from input_sources.air_quality_api import OpenMeteoInput
+from utils.retry import RetryPolicy, use_retry_policy
+from utils.geocoding import Gazetteer, use_gazetteer
+
+class FailingStub(StubServer):
+    """Local stand-in for the Open-Meteo endpoint that answers 503 to a share of requests."""
+    PATH = "/v1/air-quality"
+
+    def __init__(self, error_rate: float, seed: int = 0):
+        super().__init__()
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        latitude = request.query["latitude"]
+        if self.random.random() < self.error_rate:
+            return web.json_response({"error": True, "reason": "unavailable"}, status=503)
+        return web.json_response(
+            {"latitude": float(latitude), "hourly": {"time": ["2025-05-10T00:00"], "pm2_5": [10.0]}}
+        )
+
+async def fixed_retry(session, city, url, retries=3, delay=2):
+    fetch = OpenMeteoInput.fetch.__wrapped__
+    for attempt in range(1, retries + 1):
+        try:
+            return await fetch(session, city, url)
+        except Exception:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(delay)
+
+async def fetch_all(session, cities, url, fixed: bool):
+    fetch = fixed_retry if fixed else OpenMeteoInput.fetch
+    results = await asyncio.gather(*(fetch(session, city, url) for city in cities), return_exceptions=True)
+    return sum(not isinstance(result, Exception) for result in results)
+
+async def main_async(cities):
+    print(f"{'scenario':>8} {'retries':>8} {'requests':>9} {'fetched':>8} {'seconds':>8}")
+    async with aiohttp.ClientSession() as session:
+        for scenario, error_rate in (("down", 1.0), ("flaky", 0.2)):
+            for label in ("fixed", "policy"):
+                policy = RetryPolicy()
+                use_retry_policy(policy)
+                async with FailingStub(error_rate) as stub:
+                    start = time.perf_counter()
+                    fetched = await fetch_all(session, cities, stub.url, fixed=label == "fixed")
+                    elapsed = time.perf_counter() - start
+                use_retry_policy(None)
+                print(f"{scenario:>8} {label:>8} {stub.requests:>9} {fetched:>8} {elapsed:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retry policies against a failing stub host")
+    parser.add_argument("--cities", type=int, default=200)
+    args = parser.parse_args()
+    # The per-request failure logs would drown the table
+    logging.disable(logging.CRITICAL)
+    # Stub coordinates only need to be distinct per city
+    cities = [f"city-{i}" for i in range(args.cities)]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "gazetteer.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("name,latitude,longitude\n")
+            f.writelines(f"{city},{i * 0.01},{i * 0.01}\n" for i, city in enumerate(cities))
+        gazetteer = Gazetteer(csv_path, os.path.join(tmp, "gazetteer.sqlite"))
+        use_gazetteer(gazetteer)
+        try:
+            asyncio.run(main_async(cities))
+        finally:
+            gazetteer.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Benchmark of the per-host scheduler against a single global semaphore.
+
+Two local stub hosts are started: a slow one with high latency, and a fast
+one that enforces a request quota and answers 429 with Retry-After when it is
+exceeded. The same mix of requests is sent through a global
+asyncio.Semaphore (the previous design) and through ScheduledSession, and
+the sustained rate of successful requests is compared.
+
+Usage:
+    python -m benchmarks.bench_scheduler --slow-requests 40 --fast-requests 300
+"""
+import time
+import asyncio
+import argparse
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.stub_server import StubServer
+from utils.scheduler import HostScheduler, ScheduledSession
+
+class StubHost(StubServer):
+    """Local endpoint with fixed latency and an optional server-side token bucket quota."""
+    PATH = "/data"
+
+    def __init__(self, latency: float, quota_rate: float = 0.0, quota_burst: int = 1):
+        super().__init__()
+        self.latency = latency
+        self.quota_rate = quota_rate
+        self.quota_burst = quota_burst
+        self.tokens = float(quota_burst)
+        self.last_refill = time.monotonic()
+        self.served = 0
+        self.rejected = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.quota_rate:
+            now = time.monotonic()
+            self.tokens = min(self.quota_burst, self.tokens + (now - self.last_refill) * self.quota_rate)
+            self.last_refill = now
+            if self.tokens < 1:
+                self.rejected += 1
+                return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+            self.tokens -= 1
+        await asyncio.sleep(self.latency)
+        self.served += 1
+        return web.json_response({"ok": True})
+
+async def get_status(session, url) -> int:
+    async with session.get(url) as resp:
+        await resp.read()
+        return resp.status
+
+async def run_semaphore(urls, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession() as session:
+        async def one(url):
+            async with semaphore:
+                return await get_status(session, url)
+        return await asyncio.gather(*(one(url) for url in urls))
+
+async def run_scheduler(urls, limits):
+    scheduler = HostScheduler(limits, {"rate": 100.0, "burst": 10, "max_concurrency": 5})
+    async with aiohttp.ClientSession() as client:
+        session = ScheduledSession(client, scheduler)
+        statuses = await asyncio.gather(*(get_status(session, url) for url in urls))
+    scheduler.log_throughput()
+    return statuses
+
+async def measure(label, runner, *args):
+    start = time.perf_counter()
+    statuses = await runner(*args)
+    elapsed = time.perf_counter() - start
+    ok = sum(status == 200 for status in statuses)
+    print(f"{label:>10} {ok:>6}/{len(statuses):<6} ok {elapsed:>8.2f}s {ok / elapsed:>9.1f} ok req/s")
+
+async def main_async(args):
+    async with StubHost(args.slow_latency) as slow, \
+            StubHost(args.fast_latency, args.quota_rate, args.quota_burst) as fast:
+        # Interleave the hosts the way the pipeline interleaves sources
+        urls = [slow.url] * args.slow_requests + [fast.url] * args.fast_requests
+        urls.sort(key=lambda url: 0 if url == slow.url else 1)
+        await measure("semaphore", run_semaphore, urls, args.concurrency)
+        fast.tokens = float(fast.quota_burst)
+        limits = {
+            f"127.0.0.1:{slow.port}": {"rate": 100.0, "burst": 10, "max_concurrency": args.concurrency},
+            f"127.0.0.1:{fast.port}": {
+                # Stay a little under the provider's quota, as the production limits do
+                "rate": args.quota_rate * 0.9, "burst": args.quota_burst, "max_concurrency": args.concurrency
+            },
+        }
+        await measure("scheduler", run_scheduler, urls, limits)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-host scheduling against a global semaphore")
+    parser.add_argument("--slow-requests", type=int, default=40)
+    parser.add_argument("--fast-requests", type=int, default=300)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--fast-latency", type=float, default=0.02)
+    parser.add_argument("--quota-rate", type=float, default=50.0, help="Requests/s the fast host accepts")
+    parser.add_argument("--quota-burst", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
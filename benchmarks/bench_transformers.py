@@ -0,0 +1,169 @@
+"""
+Parity check and benchmark for the vectorized transformers.
+
+The row-wise implementations below are the transformers as they were before
+the vectorized rewrite. They are kept here only as the reference the new
+engine is checked against, and as the baseline for timings.
+
+Usage:
+    python -m benchmarks.bench_transformers --rows 10000 1000000 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_history
+from transformations.transformer import (
+    kelvin_to_celsius, add_feels_like_temp, add_humidity_level,
+    add_weather_score, add_is_rainy, clean_description, fill_missing
+)
+
+def legacy_kelvin_to_celsius(df: pd.DataFrame) -> pd.DataFrame:
+    df['temp_celsius'] = df['temp_k'].apply(lambda x: round(x - 273.15, 2) if pd.notnull(x) else "NA")
+    return df
+
+def legacy_add_feels_like_temp(df: pd.DataFrame) -> pd.DataFrame:
+    def compute_feels_like(row):
+        try:
+            if 'feels_like' in row and pd.notnull(row['feels_like']):
+                return round(row['feels_like'] - 273.15, 2)
+            temp_c = float(row['temp_celsius']) if row['temp_celsius'] != "NA" else None
+            humidity = float(row['humidity']) if row['humidity'] != "NA" else None
+            wind = float(row['wind_speed']) if row['wind_speed'] != "NA" else None
+            if temp_c is None or humidity is None or wind is None:
+                return "NA"
+            if temp_c >= 27 and humidity >= 40:
+                hi = (0.5 * temp_c) + (0.5 * humidity) - 10
+                return round(hi, 2)
+            if temp_c <= 10 and wind > 1.3:
+                wc = temp_c - (0.7 * wind)
+                return round(wc, 2)
+            return temp_c
+        except Exception:
+            return "NA"
+    df['feels_like_temp'] = df.apply(compute_feels_like, axis=1)
+    return df
+
+def legacy_add_humidity_level(df: pd.DataFrame) -> pd.DataFrame:
+    def level(h):
+        try:
+            h = float(h)
+            if h < 40:
+                return "low"
+            elif h <= 70:
+                return "moderate"
+            else:
+                return "high"
+        except:
+            return "NA"
+    df['humidity_level'] = df['humidity'].apply(level)
+    return df
+
+def legacy_add_weather_score(df: pd.DataFrame) -> pd.DataFrame:
+    def score(row):
+        try:
+            temp = float(row['temp_celsius']) if row['temp_celsius'] != "NA" else 20
+            humidity = float(row['humidity']) if row['humidity'] != "NA" else 50
+            wind = float(row['wind_speed']) if row['wind_speed'] != "NA" else 2
+            desc = str(row['description']).lower()
+            s = 10
+            if any(word in desc for word in ['rain', 'drizzle', 'storm', 'shower', 'downpour', 'sprinkle']):
+                s -= 4
+            if humidity > 80:
+                s -= 2
+            elif humidity < 30:
+                s -= 1
+            if wind > 8:
+                s -= 2
+            if temp < 10 or temp > 32:
+                s -= 2
+            return max(0, min(10, s))
+        except:
+            return "NA"
+    df['weather_score'] = df.apply(score, axis=1)
+    return df
+
+def legacy_add_is_rainy(df: pd.DataFrame) -> pd.DataFrame:
+    rain_words = ['rain', 'drizzle', 'shower', 'storm', 'downpour', 'sprinkle']
+    df['is_rainy'] = df['description'].apply(
+        lambda x: any(word in str(x).lower() for word in rain_words) if pd.notnull(x) else False
+    )
+    return df
+
+LEGACY_CHAIN = [
+    legacy_kelvin_to_celsius, legacy_add_feels_like_temp, legacy_add_humidity_level,
+    legacy_add_weather_score, legacy_add_is_rainy, clean_description, fill_missing
+]
+VECTORIZED_CHAIN = [
+    kelvin_to_celsius, add_feels_like_temp, add_humidity_level,
+    add_weather_score, add_is_rainy, clean_description, fill_missing
+]
+CHECKED_COLUMNS = [
+    'temp_celsius', 'feels_like_temp', 'humidity_level', 'weather_score', 'is_rainy', 'description'
+]
+
+def make_input(rows: int) -> pd.DataFrame:
+    """Builds a frame shaped like the one AsyncDataPipeline.run hands to the transformers."""
+    df = make_history(rows)
+    # The row-wise kelvin_to_celsius raises on "NA" temperatures, so keep temp_k complete
+    df['temp_k'] = df['temp_k'].fillna(288.15)
+    # async_read_csv boxes the history and fills gaps with "NA"; API rows carry feels_like
+    df = df.astype('object').fillna("NA")
+    feels_like = np.full(rows, np.nan)
+    api_rows = np.arange(rows) % 20 == 0
+    feels_like[api_rows] = np.round(np.random.default_rng(1).uniform(250.0, 315.0, api_rows.sum()), 2)
+    df['feels_like'] = feels_like
+    return df
+
+def run_chain(chain, df: pd.DataFrame) -> pd.DataFrame:
+    for transformer in chain:
+        df = transformer(df)
+    return df
+
+def _normalize(series: pd.Series) -> pd.Series:
+    series = series.astype('object').where(series.astype('object') != "NA", np.nan)
+    numeric = pd.to_numeric(series, errors='coerce')
+    return numeric if numeric.notna().sum() == series.notna().sum() else series.astype('string')
+
+def check_parity(rows: int = 100_000):
+    """Raises AssertionError if the vectorized chain disagrees with the row-wise one."""
+    source = make_input(rows)
+    expected = run_chain(LEGACY_CHAIN, source.copy())
+    actual = run_chain(VECTORIZED_CHAIN, source.copy())
+    for col in CHECKED_COLUMNS:
+        left, right = _normalize(expected[col]), _normalize(actual[col])
+        if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+            same = np.isclose(left.to_numpy(dtype=float), right.to_numpy(dtype=float), atol=1e-9, equal_nan=True)
+        else:
+            same = (left.fillna("NA") == right.fillna("NA")).to_numpy(dtype=bool)
+        assert same.all(), f"{col}: {(~same).sum()} of {rows} rows differ, e.g. {expected.loc[~same, col].head(3).tolist()} vs {actual.loc[~same, col].head(3).tolist()}"
+    print(f"parity ok on {rows} rows ({', '.join(CHECKED_COLUMNS)})")
+
+def time_chain(chain, df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    run_chain(chain, df)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row-wise vs vectorized transformers")
+    parser.add_argument("--rows", nargs="+", type=int, default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--legacy-max-rows", type=int, default=1_000_000,
+                        help="Skip the row-wise chain above this size (it takes minutes)")
+    parser.add_argument("--parity-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    check_parity(args.parity_rows)
+    print(f"{'rows':>12} {'row-wise s':>12} {'vectorized s':>13} {'speedup':>9}")
+    for rows in args.rows:
+        df = make_input(rows)
+        vectorized = time_chain(VECTORIZED_CHAIN, df.copy())
+        if rows <= args.legacy_max_rows:
+            legacy = time_chain(LEGACY_CHAIN, df.copy())
+            print(f"{rows:>12} {legacy:>12.3f} {vectorized:>13.3f} {legacy / vectorized:>8.1f}x")
+        else:
+            print(f"{rows:>12} {'skipped':>12} {vectorized:>13.3f} {'-':>9}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
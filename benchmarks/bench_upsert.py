@@ -0,0 +1,74 @@
+"""
+Write time of SQLiteOutput as the store grows, against CSVOutput appends.
+
+Each round writes --rows new rows plus a re-sent --overlap fraction of
+rows written in earlier rounds, as a re-read of the historical CSV would.
+Both outputs get the same frames: the CSV keeps every copy, while the
+SQLite table keeps one row per (city, timestamp, source). Write time should
+follow the rows of the round rather than the rows already stored. Finally
+every row is written to the table again, which must leave it unchanged.
+Files are written to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_upsert --rows 100000 --rounds 10 --overlap 0.2
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic import make_history
+from outputs.output_writer import CSVOutput, SQLiteOutput, KEY_COLUMNS
+
+def table_state(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT count(*), total(temp_k), total(humidity) FROM weather").fetchone()
+    finally:
+        conn.close()
+
+def timed_write(write, df: pd.DataFrame, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    asyncio.run(write(df, *args, **kwargs))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite upsert output as the store grows")
+    parser.add_argument("--rows", type=int, default=100_000, help="New rows per round")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--overlap", type=float, default=0.2, help="Re-sent rows per round, as a fraction of --rows")
+    parser.add_argument("--batch-size", type=int, default=None, help="Overrides SQLITE_BATCH_SIZE")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, csv_path = os.path.join(tmp, "out.sqlite"), os.path.join(tmp, "out.csv")
+        options = {"batch_size": args.batch_size} if args.batch_size else {}
+        written = []
+        print(f"{'round':>5} {'stored':>10} {'csv rows':>10} {'upsert s':>9} {'rows/s':>10} {'csv s':>8}")
+        for round_ in range(args.rounds):
+            df = make_history(args.rows, seed=round_)
+            if written and args.overlap:
+                earlier = pd.concat(written, ignore_index=True)
+                df = pd.concat([df, earlier.sample(min(len(earlier), int(args.rows * args.overlap)), random_state=round_)])
+            written.append(df)
+            upsert = timed_write(SQLiteOutput.write, df, db_path, **options)
+            append = timed_write(CSVOutput.write, df, csv_path)
+            stored = table_state(db_path)[0]
+            csv_rows = sum(len(frame) for frame in written)
+            print(f"{round_ + 1:>5} {stored:>10} {csv_rows:>10} {upsert:>9.3f} {len(df) / upsert:>10.0f} {append:>8.3f}")
+
+        everything = pd.concat(written, ignore_index=True)
+        expected = len(everything.drop_duplicates(list(KEY_COLUMNS)))
+        before = table_state(db_path)
+        assert before[0] == expected, f"table holds {before[0]} rows, expected {expected} distinct keys"
+        rewrite = timed_write(SQLiteOutput.write, everything, db_path, **options)
+        assert table_state(db_path) == before, "writing the same rows again changed the table"
+        print(f"rewrite of all {len(everything)} rows: {rewrite:.3f}s, table unchanged at {before[0]} rows")
+        print(f"size: sqlite {os.path.getsize(db_path) / 1e6:.1f} MB, csv {os.path.getsize(csv_path) / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Local aiohttp server imitating the three upstream APIs of input_sources/.
+
+Serves the OpenWeather current-weather endpoint, OpenAQ's latest
+measurements and Open-Meteo's air-quality endpoint (including
+multi-location requests) on one port, with responses shaped like the real
+ones. Every response waits latency seconds (+/- jitter), error_rate of the
+requests are answered with 503, and payload_bytes of padding are added to
+each JSON body. Answers are random but seeded, so runs are comparable.
+
+Point the sources at it with OPENWEATHER_URL, OPENAQ_URL and
+OPEN_METEO_AQ_URL (see urls()). It can also be run on its own:
+
+    python -m benchmarks.mock_apis --port 8080 --latency 0.05 --error-rate 0.01
+"""
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict
+
+from aiohttp import web
+
+from benchmarks.stub_server import StubServer
+from benchmarks.synthetic import DESCRIPTIONS
+
+class MockAPIs(StubServer):
+    """The three upstream endpoints on one local port, counting requests and injected errors per endpoint."""
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        payload_bytes: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0
+    ):
+        super().__init__(host, port)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.padding = "x" * payload_bytes
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def urls(self) -> Dict[str, str]:
+        """Environment variables that point the sources at this server."""
+        return {
+            "OPENWEATHER_URL": f"{self.base_url}/data/2.5/weather",
+            "OPENAQ_URL": f"{self.base_url}/v2/latest",
+            "OPEN_METEO_AQ_URL": f"{self.base_url}/v1/air-quality",
+        }
+
+    async def _answer(self, endpoint: str, build) -> web.Response:
+        self.requests[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+        if self.random.random() < self.error_rate:
+            self.errors[endpoint] += 1
+            return web.json_response({"message": "service unavailable"}, status=503)
+        body = build()
+        if self.padding:
+            if isinstance(body, list):
+                for item in body:
+                    item["padding"] = self.padding
+            else:
+                body["padding"] = self.padding
+        return web.json_response(body)
+
+    async def weather(self, request: web.Request) -> web.Response:
+        rng = self.random
+        def build():
+            temp = round(rng.uniform(250.0, 315.0), 2)
+            return {
+                "name": request.query.get("q", "mock"),
+                "main": {"temp": temp, "feels_like": round(temp - rng.uniform(0, 4), 2), "humidity": rng.randint(5, 100)},
+                "wind": {"speed": round(rng.uniform(0, 15), 1)},
+                "weather": [{"description": rng.choice(DESCRIPTIONS)}],
+            }
+        return await self._answer("openweather", build)
+
+    async def openaq(self, request: web.Request) -> web.Response:
+        rng = self.random
+        def build():
+            return {"results": [{
+                "city": request.query.get("city"),
+                "measurements": [
+                    {"parameter": "pm25", "value": round(rng.uniform(0, 150), 1)},
+                    {"parameter": "pm10", "value": round(rng.uniform(0, 200), 1)},
+                ],
+            }]}
+        return await self._answer("openaq", build)
+
+    async def open_meteo(self, request: web.Request) -> web.Response:
+        rng = self.random
+        latitudes = request.query.get("latitude", "").split(",")
+        past_days = int(request.query.get("past_days", 1))
+        forecast_days = int(request.query.get("forecast_days", 1))
+        start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=past_days)
+        times = [(start + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range((past_days + forecast_days) * 24)]
+        def build():
+            locations = [
+                {"latitude": float(lat), "hourly": {"time": times, "pm2_5": [round(rng.uniform(0, 80), 1) for _ in times]}}
+                for lat in latitudes
+            ]
+            return locations if len(locations) > 1 else locations[0]
+        return await self._answer("open-meteo", build)
+
+    def routes(self):
+        return {"/data/2.5/weather": self.weather, "/v2/latest": self.openaq, "/v1/air-quality": self.open_meteo}
+
+async def serve(mock: MockAPIs):
+    async with mock:
+        for name, url in mock.urls().items():
+            print(f"{name}={url}")
+        await asyncio.Event().wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local mocks of the weather and air-quality APIs")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency spread as a fraction of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="Padding added to every JSON response")
+    args = parser.parse_args()
+    mock = MockAPIs(args.latency, args.jitter, args.error_rate, args.payload_bytes, port=args.port)
+    try:
+        asyncio.run(serve(mock))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Base of the local aiohttp servers the benchmarks run against.
+
+A subclass serves handle() on PATH, or overrides routes() to serve several
+endpoints. Entering the context starts it on host:port (a free port by
+default) and sets base_url and url, the address of PATH; leaving it stops
+the server.
+"""
+from typing import Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+
+Handler = Callable[[web.Request], Awaitable[web.Response]]
+
+class StubServer:
+    PATH = "/"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+        self.url: Optional[str] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        raise NotImplementedError
+
+    def routes(self) -> Dict[str, Handler]:
+        """GET handler of each path served."""
+        return {self.PATH: self.handle}
+
+    async def __aenter__(self):
+        app = web.Application()
+        for path, handler in self.routes().items():
+            app.router.add_get(path, handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{self.port}"
+        self.url = f"{self.base_url}{self.PATH}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
\ No newline at end of file
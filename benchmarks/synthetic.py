@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from config import CITIES
+
+DESCRIPTIONS = [
+    "clear sky", "few clouds", "scattered clouds", "broken clouds", "overcast clouds",
+    "light rain", "moderate rain", "heavy intensity rain", "shower rain", "drizzle",
+    "thunderstorm", "haze", "mist", "snow"
+]
+
+def make_history(rows: int, cities=None, missing_rate: float = 0.01, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a synthetic frame shaped like historical_weather_data.csv.
+
+    Args:
+        rows (int): Number of rows to generate.
+        cities (list, optional): City names to draw from. Defaults to config.CITIES.
+        missing_rate (float): Fraction of measurement cells left empty.
+        seed (int): Random seed, so runs are comparable across commits.
+
+    Returns:
+        pd.DataFrame: Frame with city, temp_k, humidity, wind_speed, description, timestamp, source.
+    """
+    rng = np.random.default_rng(seed)
+    cities = np.asarray(cities or CITIES, dtype=object)
+    df = pd.DataFrame({
+        "city": cities[rng.integers(0, len(cities), rows)],
+        "temp_k": np.round(rng.uniform(250.0, 315.0, rows), 2),
+        "humidity": rng.integers(5, 100, rows).astype("float64"),
+        "wind_speed": np.round(rng.uniform(0.0, 15.0, rows), 1),
+        "description": np.asarray(DESCRIPTIONS, dtype=object)[rng.integers(0, len(DESCRIPTIONS), rows)],
+        "timestamp": (
+            pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, rows), unit="s")
+        ).strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": "local-csv",
+    })
+    for col in ["temp_k", "humidity", "wind_speed"]:
+        df.loc[rng.random(rows) < missing_rate, col] = np.nan
+    return df
\ No newline at end of file
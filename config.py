@@ -3,4 +3,76 @@ import os
 API_KEY = os.getenv("WEATHER_API_KEY", "924fbf7b7da9fb8bb8763303b4e0b122")
 CITIES = os.getenv("CITIES", "London,New York,Mumbai,Toronto,Tokyo,Paris,Sydney,Cape Town,São Paulo,Moscow,Beijing,Seoul,Dubai,Bangkok,Mexico City,Istanbul,Berlin,Singapore,Los Angeles,Rome").split(",")
 MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", 5))
-CSV_FILE = os.getenv("CSV_FILE", "historical_weather_data.csv")
\ No newline at end of file
+CSV_FILE = os.getenv("CSV_FILE", "historical_weather_data.csv")
+CSV_CHUNKSIZE = int(os.getenv("CSV_CHUNKSIZE", 0))
+STATE_FILE = os.getenv("STATE_FILE", "pipeline_state.json")
+PARQUET_DIR = os.getenv("PARQUET_DIR", "transformed_output_parquet")
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", 128_000))
+PARQUET_DATE_FORMAT = os.getenv("PARQUET_DATE_FORMAT", "%Y-%m")
+# SQLite sink: database file, table keyed on (city, timestamp, source), and rows per executemany
+SQLITE_OUTPUT_FILE = os.getenv("SQLITE_OUTPUT_FILE", "transformed_output.sqlite")
+SQLITE_OUTPUT_TABLE = os.getenv("SQLITE_OUTPUT_TABLE", "weather")
+SQLITE_BATCH_SIZE = int(os.getenv("SQLITE_BATCH_SIZE", 50_000))
+# Page cache of the SQLite sink's connection; the key index of a large table should fit in it
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", 64))
+# Endpoints of the sources, e.g. to point them at a local mock for benchmarks
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/weather")
+OPENAQ_URL = os.getenv("OPENAQ_URL", "https://api.openaq.org/v2/latest")
+OPEN_METEO_AQ_URL = os.getenv("OPEN_METEO_AQ_URL", "https://air-quality-api.open-meteo.com/v1/air-quality")
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", 50))
+OPEN_METEO_PAST_DAYS = int(os.getenv("OPEN_METEO_PAST_DAYS", 1))
+OPEN_METEO_FORECAST_DAYS = int(os.getenv("OPEN_METEO_FORECAST_DAYS", 1))
+HOURLY_AQI_FILE = os.getenv("HOURLY_AQI_FILE", "hourly_aqi.csv")
+# City coordinates: a GeoNames dump or CSV, indexed once into GAZETTEER_DB for lookups
+GAZETTEER_CSV = os.getenv("GAZETTEER_CSV", "gazetteer.csv")
+GAZETTEER_DB = os.getenv("GAZETTEER_DB", "gazetteer.sqlite")
+# Query OpenWeather by the gazetteer's coordinates instead of by name when a city is known
+WEATHER_BY_COORDS = os.getenv("WEATHER_BY_COORDS", "true").lower() in ("1", "true", "yes")
+CACHE_FILE = os.getenv("CACHE_FILE", "response_cache.sqlite")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10_000))
+# TTL in seconds per source, keyed by the "source" field of the records it returns
+CACHE_TTLS = {
+    "api": int(os.getenv("CACHE_TTL_API", 600)),
+    "openaq": int(os.getenv("CACHE_TTL_OPENAQ", 1800)),
+    "open-meteo": int(os.getenv("CACHE_TTL_OPEN_METEO", 3600))
+}
+# Per-host request rate (tokens/s), burst size and concurrency ceiling; hosts not listed use the defaults
+HOST_LIMITS = {
+    "api.openweathermap.org": {"rate": 1.0, "burst": 60, "max_concurrency": 10},
+    "api.openaq.org": {"rate": 1.0, "burst": 60, "max_concurrency": 10},
+    "air-quality-api.open-meteo.com": {"rate": 10.0, "burst": 100, "max_concurrency": 10}
+}
+DEFAULT_HOST_LIMITS = {"rate": 10.0, "burst": 10, "max_concurrency": MAX_CONCURRENCY}
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 100))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", 10))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_TIMEOUT_TOTAL = float(os.getenv("HTTP_TIMEOUT_TOTAL", 30))
+HTTP_TIMEOUT_CONNECT = float(os.getenv("HTTP_TIMEOUT_CONNECT", 10))
+HTTP_TIMEOUT_READ = float(os.getenv("HTTP_TIMEOUT_READ", 20))
+HTTP_AUTO_DECOMPRESS = os.getenv("HTTP_AUTO_DECOMPRESS", "true").lower() in ("1", "true", "yes")
+SERVE_INTERVAL = float(os.getenv("SERVE_INTERVAL", 300))
+SERVE_JITTER = float(os.getenv("SERVE_JITTER", 0.1))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 64))
+STREAM_CHUNKSIZE = int(os.getenv("STREAM_CHUNKSIZE", 10_000))
+WORKERS = int(os.getenv("WORKERS", 1))
+WORKER_MIN_ROWS = int(os.getenv("WORKER_MIN_ROWS", 50_000))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Per-request fetch lines: level (DEBUG drops them from the log) and the fraction of them kept
+LOG_FETCH_LEVEL = os.getenv("LOG_FETCH_LEVEL", "INFO").upper()
+LOG_FETCH_SAMPLE = float(os.getenv("LOG_FETCH_SAMPLE", 1.0))
+# Retry policy shared by sources and outputs: attempts per call, backoff base and cap in seconds,
+# retries allowed per run, and consecutive failures that open a host's circuit for BREAKER_RESET seconds
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 3))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 30))
+RETRY_BUDGET = int(os.getenv("RETRY_BUDGET", 100))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", 5))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", 60))
+# Instrumentation exports, rewritten after every run or serve cycle (empty turns them off):
+# a Prometheus textfile (for node_exporter's textfile collector) and a JSON summary of the run
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_SUMMARY = os.getenv("METRICS_SUMMARY", "")
+# Directory of the cProfile/tracemalloc reports written by --profile
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
\ No newline at end of file
@@ -1,20 +1,39 @@
+import time
 import aiohttp
-from typing import Dict, Any
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+from urllib.parse import urlsplit
 import logging
-from utils.logging_utils import async_retry
+from config import OPENAQ_URL, OPEN_METEO_AQ_URL, OPEN_METEO_BATCH_SIZE, OPEN_METEO_PAST_DAYS, OPEN_METEO_FORECAST_DAYS
+from utils.logging_utils import log_fetch
+from utils.retry import retrying, raise_for_transient, retry_after, HttpStatusError
+from utils.geocoding import coordinates, gazetteer
+from utils.response_cache import cached, cached_batch, conditional_headers, remember_validators, NOT_MODIFIED
+
+OPENAQ_HOST = urlsplit(OPENAQ_URL).hostname
+OPEN_METEO_HOST = urlsplit(OPEN_METEO_AQ_URL).hostname
 
 class OpenAQInput:
+    FIELDS = ("aqi",)
+    MERGE_ON = ("city",)
+
     @staticmethod
-    @async_retry(retries=3, delay=2)
+    @cached("openaq")
+    @retrying(OPENAQ_HOST)
     async def fetch(session: aiohttp.ClientSession, city: str) -> Dict[str, Any]:
-        url = f"https://api.openaq.org/v2/latest?city={city}"
+        url = f"{OPENAQ_URL}?city={city}"
+        started = time.perf_counter()
         try:
-            logging.info(f"Fetching air quality for {city} from OpenAQ")
-            async with session.get(url, ssl=True) as resp:
+            async with session.get(url, ssl=True, headers=conditional_headers()) as resp:
+                log_fetch(f"Fetched air quality for {city} from OpenAQ", city, "openaq", started, status=resp.status)
+                if resp.status == 304:
+                    return NOT_MODIFIED
                 if resp.status == 200:
+                    remember_validators(resp)
                     data = await resp.json()
-                    aqi = "NA"
+                    aqi = None
                     if data.get("results"):
                         for measurement in data["results"][0].get("measurements", []):
                             if measurement["parameter"] in ["pm25", "pm10"]:
@@ -27,62 +46,169 @@ class OpenAQInput:
                         "timestamp": datetime.utcnow().isoformat()
                     }
                 else:
+                    raise_for_transient(resp)
                     logging.error(f"OpenAQ API error for {city}: Status {resp.status}")
-                    return {"city": city, "aqi": "NA", "source": "openaq", "timestamp": None}
+                    return {"city": city, "aqi": None, "source": "openaq", "timestamp": None}
         except Exception as e:
+            # Raised so transient failures are retried; the pipeline logs the final failure
             logging.error(f"Exception fetching OpenAQ data for {city}: {e}")
-            return {"city": city, "aqi": "NA", "source": "openaq", "timestamp": None}
+            raise
 
 class OpenMeteoInput:
+    FIELDS = ("aqi_open_meteo",)
+    # As-of join: the last hourly reading at or before the weather observation, at most an hour old
+    MERGE_ON = ("city",)
+    MERGE_TOLERANCE = 3600
+    BATCH_SIZE = OPEN_METEO_BATCH_SIZE
+
     @staticmethod
-    @async_retry(retries=3, delay=2)
-    async def fetch(session: aiohttp.ClientSession, city: str) -> Dict[str, Any]:
-        city_coords = {
-            "London": (51.5074, -0.1278),
-            "New York": (40.7128, -74.0060),
-            "Mumbai": (19.0760, 72.8777),
-            "Tokyo": (35.6895, 139.6917),
-            "Toronto": (43.651070, -79.347015),
-            "Sydney": (-33.8688, 151.2093),
-            "Paris": (48.8566, 2.3522),
-            "Beijing": (39.9042, 116.4074),
-            "Moscow": (55.7558, 37.6173),
-            "Los Angeles": (34.0522, -118.2437),
-            "Chicago": (41.8781, -87.6298),
-            "Singapore": (1.3521, 103.8198),
-            "Dubai": (25.2048, 55.2708),
-            "Johannesburg": (-26.2041, 28.0473),
-            "São Paulo": (-23.5505, -46.6333),
-            "Mexico City": (19.4326, -99.1332),
-            "Istanbul": (41.0082, 28.9784),
-            "Seoul": (37.5665, 126.9780),
-            "Berlin": (52.5200, 13.4050),
-            "Hong Kong": (22.3193, 114.1694)
-        }
-        lat, lon = city_coords.get(city, (None, None))
-        if lat is None or lon is None:
+    @retrying(OPEN_METEO_HOST)
+    async def fetch(session: aiohttp.ClientSession, city: str, url: str = OPEN_METEO_AQ_URL) -> Dict[str, Any]:
+        coords = coordinates(city)
+        if coords is None:
             logging.error(f"No coordinates found for city: {city}")
-            return {"city": city, "aqi_open_meteo": "NA", "source": "open-meteo", "timestamp": None}
-        url = f"https://air-quality-api.open-meteo.com/v1/air-quality?latitude={lat}&longitude={lon}&hourly=pm2_5"
+            return OpenMeteoInput._missing(city)
+        lat, lon = coords
+        url = f"{url}?latitude={lat}&longitude={lon}{OpenMeteoInput._series_params()}"
+        started = time.perf_counter()
         try:
-            logging.info(f"Fetching air quality for {city} from Open-Meteo")
             async with session.get(url, ssl=True) as resp:
+                log_fetch(f"Fetched air quality for {city} from Open-Meteo", city, "open-meteo", started, status=resp.status)
                 if resp.status == 200:
                     data = await resp.json()
-                    pm25 = "NA"
-                    if "hourly" in data and "pm2_5" in data["hourly"]:
-                        pm25_list = data["hourly"]["pm2_5"]
-                        if isinstance(pm25_list, list) and len(pm25_list) > 0:
-                            pm25 = pm25_list[-1]
-                    return {
-                        "city": city,
-                        "aqi_open_meteo": pm25,
-                        "source": "open-meteo",
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
+                    return OpenMeteoInput._record(city, data)
                 else:
+                    raise_for_transient(resp)
                     logging.error(f"Open-Meteo API error for {city}: Status {resp.status}")
-                    return {"city": city, "aqi_open_meteo": "NA", "source": "open-meteo", "timestamp": None}
+                    return OpenMeteoInput._missing(city)
         except Exception as e:
             logging.error(f"Exception fetching Open-Meteo data for {city}: {e}")
-            return {"city": city, "aqi_open_meteo": "NA", "source": "open-meteo", "timestamp": None}
\ No newline at end of file
+            raise
+
+    @staticmethod
+    @cached_batch("open-meteo")
+    async def fetch_batch(
+        session: aiohttp.ClientSession, cities: List[str], url: str = OPEN_METEO_AQ_URL
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetches several cities in one request using comma-separated coordinates.
+
+        Open-Meteo answers a multi-location request with a list of results in
+        request order. The batch request is retried like any fetch; if it still
+        fails, each city is fetched on its own (failing fast once the host's
+        circuit is open).
+        Results are cached per city; Open-Meteo sends no validators, so stale
+        entries are simply refetched.
+        """
+        coords = gazetteer().locate(cities)
+        located = [city for city in cities if city in coords]
+        results = []
+        for city in cities:
+            if city not in coords:
+                logging.error(f"No coordinates found for city: {city}")
+                results.append(OpenMeteoInput._missing(city))
+        if not located:
+            return results
+        latitudes = ",".join(str(coords[city][0]) for city in located)
+        longitudes = ",".join(str(coords[city][1]) for city in located)
+        batch_url = f"{url}?latitude={latitudes}&longitude={longitudes}{OpenMeteoInput._series_params()}"
+        try:
+            locations = await OpenMeteoInput._fetch_locations(session, batch_url, len(located))
+            if len(locations) != len(located):
+                raise ValueError(f"expected {len(located)} locations, got {len(locations)}")
+            return results + [OpenMeteoInput._record(city, item) for city, item in zip(located, locations)]
+        except Exception as e:
+            logging.error(f"Open-Meteo batch of {len(located)} cities failed, falling back to per-city requests: {e}")
+        for city in located:
+            try:
+                results.append(await OpenMeteoInput.fetch(session, city, url))
+            except Exception as e:
+                logging.error(f"Fetch failed after retries: {e}")
+                results.append(OpenMeteoInput._missing(city))
+        return results
+
+    @staticmethod
+    @retrying(OPEN_METEO_HOST)
+    async def _fetch_locations(session: aiohttp.ClientSession, batch_url: str, count: int) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        async with session.get(batch_url, ssl=True) as resp:
+            log_fetch(
+                f"Fetched air quality for {count} cities from Open-Meteo in one request",
+                None, "open-meteo", started, status=resp.status
+            )
+            if resp.status != 200:
+                raise HttpStatusError(resp.status, resp.url.host, retry_after(resp))
+            data = await resp.json()
+        return data if isinstance(data, list) else [data]
+
+    @staticmethod
+    def readings(records: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Expands the hourly blocks of records into one typed row per city and hour.
+
+        Returns columns city, timestamp (datetime64) and aqi_open_meteo (float32),
+        the form ReadingIndex joins on.
+        """
+        blocks = [(record["city"], record["hourly"]) for record in records if record.get("hourly")]
+        if not blocks:
+            return pd.DataFrame({
+                "city": pd.Series(dtype=object),
+                "timestamp": pd.Series(dtype="datetime64[s]"),
+                "aqi_open_meteo": pd.Series(dtype=np.float32)
+            })
+        lengths = np.array([len(block["pm2_5"]) for _, block in blocks])
+        starts = np.array([np.datetime64(block["start"], "s") for _, block in blocks])
+        hours = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        values = [np.nan if value is None else value for _, block in blocks for value in block["pm2_5"]]
+        return pd.DataFrame({
+            "city": np.repeat(np.array([city for city, _ in blocks], dtype=object), lengths),
+            "timestamp": np.repeat(starts, lengths) + hours.astype("timedelta64[h]"),
+            "aqi_open_meteo": np.array(values, dtype=np.float32)
+        })
+
+    @staticmethod
+    def hourly_table(records: List[Dict[str, Any]], until: Optional[datetime] = None) -> pd.DataFrame:
+        """Rows of the hourly AQI table: every hour up to until (default now), leaving out forecast hours."""
+        df = OpenMeteoInput.readings(records)
+        df = df[df["timestamp"] <= np.datetime64(until or datetime.utcnow(), "s")]
+        return pd.DataFrame({
+            "city": df["city"],
+            "timestamp": df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pm2_5": df["aqi_open_meteo"],
+            "source": "open-meteo"
+        })
+
+    @staticmethod
+    def _series_params() -> str:
+        # Only the window that is needed: the last past_days plus today's forecast hours
+        return f"&hourly=pm2_5&past_days={OPEN_METEO_PAST_DAYS}&forecast_days={OPEN_METEO_FORECAST_DAYS}&timezone=GMT"
+
+    @staticmethod
+    def _record(city: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keeps the whole hourly series as a block (start hour plus values) and the
+        value of the current hour, the latest one that is not a forecast.
+        """
+        hourly = data.get("hourly") or {}
+        times, pm25_list = hourly.get("time"), hourly.get("pm2_5")
+        if not isinstance(times, list) or not isinstance(pm25_list, list) or len(times) != len(pm25_list) or not times:
+            return {**OpenMeteoInput._missing(city), "timestamp": datetime.utcnow().isoformat()}
+        now = datetime.utcnow()
+        pm25, observed = None, None
+        for stamp, value in zip(times, pm25_list):
+            hour = datetime.fromisoformat(stamp)
+            if hour > now:
+                break
+            if value is not None:
+                pm25, observed = value, hour
+        return {
+            "city": city,
+            "aqi_open_meteo": pm25,
+            "source": "open-meteo",
+            "timestamp": (observed or now).isoformat(),
+            "hourly": {"start": times[0], "pm2_5": pm25_list}
+        }
+
+    @staticmethod
+    def _missing(city: str) -> Dict[str, Any]:
+        return {"city": city, "aqi_open_meteo": None, "source": "open-meteo", "timestamp": None, "hourly": None}
\ No newline at end of file
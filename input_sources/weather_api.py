@@ -1,19 +1,40 @@
+import time
 import aiohttp
+from urllib.parse import urlsplit
 from typing import List, Dict, Any
 from datetime import datetime
 import logging
-from config import API_KEY
-from utils.logging_utils import async_retry
+from config import API_KEY, WEATHER_BY_COORDS, OPENWEATHER_URL
+from utils.logging_utils import log_fetch
+from utils.retry import retrying, raise_for_transient
+from utils.geocoding import coordinates
+from utils.response_cache import cached, conditional_headers, remember_validators, NOT_MODIFIED
+
+WEATHER_HOST = urlsplit(OPENWEATHER_URL).hostname
 
 class WeatherAPIInput:
+    # Columns this source contributes to a merged row; MERGE_ON None marks the primary source
+    FIELDS = ("city", "temp_k", "humidity", "wind_speed", "description", "feels_like", "source", "timestamp")
+    MERGE_ON = None
+
     @staticmethod
-    @async_retry(retries=3, delay=2)
+    @cached("api")
+    @retrying(WEATHER_HOST)
     async def fetch(session: aiohttp.ClientSession, city: str) -> Dict[str, Any]:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}"
+        # By coordinates when the gazetteer knows the city, which spares the server resolving the name
+        coords = coordinates(city) if WEATHER_BY_COORDS else None
+        if coords is not None:
+            url = f"{OPENWEATHER_URL}?lat={coords[0]}&lon={coords[1]}&appid={API_KEY}"
+        else:
+            url = f"{OPENWEATHER_URL}?q={city}&appid={API_KEY}"
+        started = time.perf_counter()
         try:
-            logging.info(f"Fetching weather for {city} from API")
-            async with session.get(url, ssl=True) as resp:
+            async with session.get(url, ssl=True, headers=conditional_headers()) as resp:
+                log_fetch(f"Fetched weather for {city} from API", city, "api", started, status=resp.status)
+                if resp.status == 304:
+                    return NOT_MODIFIED
                 if resp.status == 200:
+                    remember_validators(resp)
                     data = await resp.json()
                     return {
                         "city": city,
@@ -26,6 +47,7 @@ class WeatherAPIInput:
                         "timestamp": datetime.utcnow().isoformat()
                     }
                 else:
+                    raise_for_transient(resp)
                     logging.error(f"API error for {city}: Status {resp.status}")
                     return {"city": city, "temp_k": None, "humidity": None, "wind_speed": None, "description": None, "feels_like": None, "source": "api", "timestamp": None}
         except Exception as e:
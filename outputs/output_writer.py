@@ -1,39 +1,262 @@
 import os
+import uuid
+import shutil
+import sqlite3
+import asyncio
 import logging
+from typing import Iterator, Tuple
+import numpy as np
 import pandas as pd
+from utils.schema import output_ready, widen
+from config import (
+    PARQUET_DIR, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE, PARQUET_DATE_FORMAT, HOURLY_AQI_FILE,
+    SQLITE_OUTPUT_FILE, SQLITE_OUTPUT_TABLE, SQLITE_BATCH_SIZE, SQLITE_CACHE_MB
+)
 
 class CSVOutput:
+    # File written by default; its growth is reported as the output's bytes written
+    FILE = "transformed_output.csv"
+
+    @staticmethod
+    async def write(df: pd.DataFrame, filename: str = FILE):
+        write_header = not os.path.exists(filename)
+        output_ready(df).to_csv(filename, mode='a', header=write_header, index=False, na_rep="NA")
+        logging.info(f"Appended DataFrame to {filename}")
+
     @staticmethod
-    async def write(df: pd.DataFrame, filename: str = "transformed_output.csv"):
+    async def reset(filename: str = FILE):
         try:
-            write_header = not os.path.exists(filename)
-            df.to_csv(filename, mode='a', header=write_header, index=False)
-            logging.info(f"Appended DataFrame to {filename}")
+            if os.path.exists(filename):
+                os.remove(filename)
+                logging.info(f"Removed {filename} for a full refresh")
         except Exception as e:
-            logging.error(f"Failed to append DataFrame to {filename}: {e}")
+            logging.error(f"Failed to remove {filename}: {e}")
 
-class BlockedOutput:
+class HourlyAQIOutput:
+    """Hourly AQI table: one row per city and hour, appended as new hours are observed."""
+    FILE = HOURLY_AQI_FILE
+
+    @staticmethod
+    async def write(df: pd.DataFrame, filename: str = HOURLY_AQI_FILE):
+        await CSVOutput.write(df, filename)
+
+    @staticmethod
+    async def reset(filename: str = HOURLY_AQI_FILE):
+        await CSVOutput.reset(filename)
+
+class ParquetOutput:
     @staticmethod
-    async def write(df: pd.DataFrame, filename: str = "output-blocked-write.csv"):
+    async def write(
+        df: pd.DataFrame,
+        root_path: str = PARQUET_DIR,
+        compression: str = PARQUET_COMPRESSION,
+        row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+        date_format: str = PARQUET_DATE_FORMAT
+    ):
+        files = await asyncio.to_thread(
+            _write_parquet_dataset, df, root_path, compression, row_group_size, date_format
+        )
+        logging.info(f"Wrote DataFrame to {files} Parquet file(s) under {root_path}")
+
+    @staticmethod
+    async def reset(root_path: str = PARQUET_DIR):
         try:
-            if os.path.exists(filename):
-                if os.name == 'nt':
-                    import ctypes
-                    FILE_ATTRIBUTE_READONLY = 0x01
-                    ctypes.windll.kernel32.SetFileAttributesW(filename, FILE_ATTRIBUTE_READONLY)
-                else:
-                    os.chmod(filename, 0o444)
-            df.to_csv(filename, index=False)
-            logging.info(f"Saved DataFrame to {filename} (should not succeed if permissions are blocked)")
+            if os.path.exists(root_path):
+                await asyncio.to_thread(shutil.rmtree, root_path)
+                logging.info(f"Removed {root_path} for a full refresh")
         except Exception as e:
-            logging.error(f"Failed to save DataFrame to blocked file {filename}: {e}")
+            logging.error(f"Failed to remove {root_path}: {e}")
 
-class ConsoleOutput:
+TEXT_COLUMNS = ('city', 'description', 'timestamp', 'source', 'humidity_level')
+
+def _arrow_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns "NA" placeholders back into nulls and gives object columns one type.
+
+    Columns that are numeric apart from their "NA" cells become float64, the
+    rest become strings, so every append produces the same Parquet schema.
+    Typed columns are brought to the same form: timestamps and categoricals
+    go through output_ready() and float32 measurements become float64.
+    """
+    df = output_ready(df).copy()
+    for col in df.columns:
+        if df[col].dtype == np.float32:
+            df[col] = widen(df[col].to_numpy())
+            continue
+        if df[col].dtype != object and not pd.api.types.is_string_dtype(df[col]):
+            continue
+        values = df[col].mask(df[col] == "NA")
+        if col not in TEXT_COLUMNS:
+            numeric = pd.to_numeric(values, errors='coerce')
+            if numeric.notna().sum() == values.notna().sum():
+                df[col] = numeric.astype('float64')
+                continue
+        df[col] = values.astype('string')
+    return df
+
+def _write_parquet_dataset(
+    df: pd.DataFrame, root_path: str, compression: str, row_group_size: int, date_format: str
+) -> int:
+    """
+    Appends df to a hive-partitioned (city=/date=) Parquet dataset.
+
+    The date partition is the timestamp's day formatted with date_format.
+    The default "%Y-%m" gives monthly partitions: every run adds a file to
+    each partition it touches, and daily partitions of one city hold too few
+    rows to be worth a file each.
+    Returns the number of files written.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if df.empty:
+        return 0
+    df = _arrow_ready(df)
+    # Format each distinct day once; strftime over every row dominates the write otherwise
+    days = pd.to_datetime(df['timestamp'], errors='coerce', format='ISO8601').dt.normalize()
+    codes, uniques = pd.factorize(days)
+    labels = np.append(pd.DatetimeIndex(uniques).strftime(date_format).to_numpy(dtype=object), 'unknown')
+    df['date'] = labels[codes]
+    df['city'] = df['city'].fillna('unknown')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    written = []
+    ds.write_dataset(
+        table,
+        root_path,
+        format='parquet',
+        partitioning=['city', 'date'],
+        partitioning_flavor='hive',
+        # Unique file names so each run appends instead of overwriting earlier partitions
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+        max_rows_per_group=row_group_size,
+        max_partitions=max(1024, len(df[['city', 'date']].drop_duplicates())),
+        file_visitor=written.append
+    )
+    return len(written)
+
+class SQLiteOutput:
+    """
+    Upserts rows into a SQLite table keyed on (city, timestamp, source).
+
+    A row whose key is already stored replaces it instead of being appended,
+    so writing the same rows again leaves the table unchanged and readers
+    never see duplicates.
+    """
     @staticmethod
-    async def write(df: pd.DataFrame):
+    async def write(
+        df: pd.DataFrame,
+        db_path: str = SQLITE_OUTPUT_FILE,
+        table: str = SQLITE_OUTPUT_TABLE,
+        batch_size: int = SQLITE_BATCH_SIZE
+    ):
+        rows, changed = await asyncio.to_thread(_upsert_sqlite, df, db_path, table, batch_size)
+        logging.info(f"Upserted {rows} rows into {table} in {db_path} ({changed} new or changed)")
+
+    @staticmethod
+    async def reset(db_path: str = SQLITE_OUTPUT_FILE):
         try:
-            print("Weather DataFrame:")
-            print(df)
-            logging.info("Printed DataFrame to console")
+            for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+            logging.info(f"Removed {db_path} for a full refresh")
         except Exception as e:
-            logging.error(f"Failed to print DataFrame: {e}")
\ No newline at end of file
+            logging.error(f"Failed to remove {db_path}: {e}")
+
+KEY_COLUMNS = ('city', 'timestamp', 'source')
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _sqlite_type(values: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(values):
+        return "REAL"
+    return "TEXT"
+
+def _sqlite_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    # Python objects with None for missing values, which is what sqlite3 binds
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+def _upsert_sqlite(df: pd.DataFrame, db_path: str, table: str, batch_size: int) -> Tuple[int, int]:
+    """
+    Upserts df into table and returns (rows written, rows inserted or changed).
+
+    Values are typed as in the Parquet dataset (see _arrow_ready). The table is
+    created WITHOUT ROWID on its key, so the key index is the table and a write
+    costs O(rows written * log rows stored). Columns the table lacks are added.
+    All batches of batch_size rows go in one transaction, so readers see a
+    write whole or not at all. A missing key part is stored as an empty
+    string, since SQLite never treats NULLs as equal in a key. Rows whose
+    values did not change are skipped rather than rewritten.
+    """
+    if df.empty:
+        return 0, 0
+    df = _arrow_ready(df)
+    for col in KEY_COLUMNS:
+        df[col] = df[col].fillna("") if col in df else ""
+    # Within one write the last row of a key wins, as it would across writes. Going in key
+    # order, consecutive rows land on the same B-tree pages instead of all over the table
+    df = df.drop_duplicates(list(KEY_COLUMNS), keep='last').sort_values(list(KEY_COLUMNS))
+    columns = list(df.columns)
+    values = [col for col in columns if col not in KEY_COLUMNS]
+    name = _quote(table)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        # WAL lets readers query the table while a write is in progress
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} (city TEXT NOT NULL, timestamp TEXT NOT NULL, source TEXT NOT NULL, "
+            "PRIMARY KEY (city, timestamp, source)) WITHOUT ROWID"
+        )
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+        for col in columns:
+            if col not in existing:
+                conn.execute(f"ALTER TABLE {name} ADD COLUMN {_quote(col)} {_sqlite_type(df[col])}")
+        conflict = "NOTHING"
+        if values:
+            assignments = ", ".join(f"{_quote(col)} = excluded.{_quote(col)}" for col in values)
+            differs = " OR ".join(f"{_quote(col)} IS NOT excluded.{_quote(col)}" for col in values)
+            conflict = f"UPDATE SET {assignments} WHERE {differs}"
+        sql = (
+            f"INSERT INTO {name} ({', '.join(map(_quote, columns))}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (city, timestamp, source) DO {conflict}"
+        )
+        before = conn.total_changes
+        with conn:
+            for start in range(0, len(df), batch_size):
+                conn.executemany(sql, _sqlite_rows(df.iloc[start:start + batch_size]))
+        return len(df), conn.total_changes - before
+    finally:
+        conn.close()
+
+class BlockedOutput:
+    FILE = "output-blocked-write.csv"
+    # Fails on purpose to show error handling; its failures do not hold back the checkpoint
+    BEST_EFFORT = True
+
+    @staticmethod
+    async def write(df: pd.DataFrame, filename: str = FILE):
+        if os.path.exists(filename):
+            if os.name == 'nt':
+                import ctypes
+                FILE_ATTRIBUTE_READONLY = 0x01
+                ctypes.windll.kernel32.SetFileAttributesW(filename, FILE_ATTRIBUTE_READONLY)
+            else:
+                os.chmod(filename, 0o444)
+        output_ready(df).to_csv(filename, index=False, na_rep="NA")
+        logging.info(f"Saved DataFrame to {filename} (should not succeed if permissions are blocked)")
+
+class ConsoleOutput:
+    BEST_EFFORT = True
+
+    @staticmethod
+    async def write(df: pd.DataFrame):
+        print("Weather DataFrame:")
+        print(output_ready(df))
+        logging.info("Printed DataFrame to console")
\ No newline at end of file
@@ -1,102 +1,130 @@
+import re
 import pandas as pd
 import numpy as np
+from utils.schema import widen
+
+RAIN_PATTERN = re.compile(r"rain|drizzle|shower|storm|downpour|sprinkle", re.IGNORECASE)
+HUMIDITY_LEVELS = pd.Index(["low", "moderate", "high"], dtype=object)
+
+def _numeric(df: pd.DataFrame, col: str) -> pd.Series:
+    """Returns a column as float64, coercing "NA" strings and other junk to NaN."""
+    if df[col].dtype == np.float32:
+        # Keep the decimal a float32 measurement stands for, so 290.15 K stays 290.15
+        return pd.Series(widen(df[col].to_numpy()), index=df.index)
+    return pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+def _round2(values) -> np.ndarray:
+    """
+    Rounds to 2 decimals exactly like the built-in round().
+
+    np.round scales by 100 first, which breaks near-ties differently from
+    round(); the few values sitting on a tie are re-rounded in Python.
+    """
+    values = np.asarray(values, dtype='float64')
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    with np.errstate(invalid='ignore'):
+        ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(v, 2) for v in values[ties].tolist()]
+    return rounded
+
+def _rain_mask(df: pd.DataFrame) -> np.ndarray:
+    """Boolean mask of rows whose description mentions rain or similar."""
+    # Descriptions repeat heavily, so match each distinct value once
+    codes, uniques = pd.factorize(df['description'])
+    matches = pd.Series(uniques).astype('string').str.contains(RAIN_PATTERN, na=False).to_numpy(dtype=bool)
+    return np.append(matches, False)[codes]
 
 def kelvin_to_celsius(df: pd.DataFrame) -> pd.DataFrame:
     """Converts temperature from Kelvin to Celsius."""
-    df['temp_celsius'] = df['temp_k'].apply(lambda x: round(x - 273.15, 2) if pd.notnull(x) else "NA")
+    df['temp_celsius'] = _round2(_numeric(df, 'temp_k') - 273.15)
     return df
 
 def add_feels_like_temp(df: pd.DataFrame) -> pd.DataFrame:
     """Adds a 'feels_like_temp' column in Celsius."""
-    def compute_feels_like(row):
-        try:
-            if 'feels_like' in row and pd.notnull(row['feels_like']):
-                return round(row['feels_like'] - 273.15, 2)
-            temp_c = float(row['temp_celsius']) if row['temp_celsius'] != "NA" else None
-            humidity = float(row['humidity']) if row['humidity'] != "NA" else None
-            wind = float(row['wind_speed']) if row['wind_speed'] != "NA" else None
-            if temp_c is None or humidity is None or wind is None:
-                return "NA"
-            # Simplified heat index formula
-            if temp_c >= 27 and humidity >= 40:
-                hi = (0.5 * temp_c) + (0.5 * humidity) - 10
-                return round(hi, 2)
-            # Simplified wind chill formula
-            if temp_c <= 10 and wind > 1.3:
-                wc = temp_c - (0.7 * wind)
-                return round(wc, 2)
-            return temp_c
-        except Exception:
-            return "NA"
-    df['feels_like_temp'] = df.apply(compute_feels_like, axis=1)
+    temp_c = _numeric(df, 'temp_celsius').to_numpy()
+    humidity = _numeric(df, 'humidity').to_numpy()
+    wind = _numeric(df, 'wind_speed').to_numpy()
+    if 'feels_like' in df.columns:
+        feels_like = _numeric(df, 'feels_like').to_numpy()
+    else:
+        feels_like = np.full(len(df), np.nan)
+    has_api_value = ~np.isnan(feels_like)
+    missing = np.isnan(temp_c) | np.isnan(humidity) | np.isnan(wind)
+    with np.errstate(invalid='ignore'):
+        # Simplified heat index and wind chill formulas
+        heat = (temp_c >= 27) & (humidity >= 40)
+        chill = (temp_c <= 10) & (wind > 1.3)
+    df['feels_like_temp'] = _round2(np.select(
+        [has_api_value, missing, heat, chill],
+        [feels_like - 273.15, np.nan, (0.5 * temp_c) + (0.5 * humidity) - 10, temp_c - (0.7 * wind)],
+        default=temp_c
+    ))
     return df
 
 def add_humidity_level(df: pd.DataFrame) -> pd.DataFrame:
     """Adds a 'humidity_level' column: 'low' (<40), 'moderate' (40-70), 'high' (>70)."""
-    def level(h):
-        try:
-            h = float(h)
-            if h < 40:
-                return "low"
-            elif h <= 70:
-                return "moderate"
-            else:
-                return "high"
-        except:
-            return "NA"
-    df['humidity_level'] = df['humidity'].apply(level)
+    humidity = _numeric(df, 'humidity').to_numpy()
+    with np.errstate(invalid='ignore'):
+        level_idx = np.select([humidity < 40, humidity <= 70, humidity > 70], [0, 1, 2], default=-1)
+    df['humidity_level'] = pd.Categorical.from_codes(level_idx, categories=HUMIDITY_LEVELS)
     return df
 
 def add_weather_score(df: pd.DataFrame) -> pd.DataFrame:
     """Adds a 'weather_score' column for event planning."""
-    def score(row):
-        try:
-            temp = float(row['temp_celsius']) if row['temp_celsius'] != "NA" else 20
-            humidity = float(row['humidity']) if row['humidity'] != "NA" else 50
-            wind = float(row['wind_speed']) if row['wind_speed'] != "NA" else 2
-            desc = str(row['description']).lower()
-            s = 10
-            if any(word in desc for word in ['rain', 'drizzle', 'storm', 'shower', 'downpour', 'sprinkle']):
-                s -= 4
-            if humidity > 80:
-                s -= 2
-            elif humidity < 30:
-                s -= 1
-            if wind > 8:
-                s -= 2
-            if temp < 10 or temp > 32:
-                s -= 2
-            return max(0, min(10, s))
-        except:
-            return "NA"
-    df['weather_score'] = df.apply(score, axis=1)
+    # Missing readings fall back to neutral values that never incur a penalty
+    temp = _numeric(df, 'temp_celsius').fillna(20).to_numpy()
+    humidity = _numeric(df, 'humidity').fillna(50).to_numpy()
+    wind = _numeric(df, 'wind_speed').fillna(2).to_numpy()
+    score = np.full(len(df), 10, dtype=np.int64)
+    score -= 4 * _rain_mask(df)
+    score -= np.select([humidity > 80, humidity < 30], [2, 1], default=0)
+    score -= 2 * (wind > 8)
+    score -= 2 * ((temp < 10) | (temp > 32))
+    df['weather_score'] = np.clip(score, 0, 10)
     return df
 
 def add_is_rainy(df: pd.DataFrame) -> pd.DataFrame:
     """Sets 'is_rainy' True if description contains rain, drizzle, shower, or similar."""
-    rain_words = ['rain', 'drizzle', 'shower', 'storm', 'downpour', 'sprinkle']
-    df['is_rainy'] = df['description'].apply(
-        lambda x: any(word in str(x).lower() for word in rain_words) if pd.notnull(x) else False
-    )
+    df['is_rainy'] = _rain_mask(df)
     return df
 
 def clean_description(df: pd.DataFrame) -> pd.DataFrame:
     """Cleans and capitalizes the weather description."""
-    df['description'] = df['description'].fillna("NA").str.capitalize()
+    description = df['description']
+    if isinstance(description.dtype, pd.CategoricalDtype):
+        # Capitalize each category once; categories that become equal are merged
+        capitalized = np.asarray(description.cat.categories.astype(object).str.capitalize(), dtype=object)
+        categories = np.unique(capitalized)
+        codes = np.append(np.searchsorted(categories, capitalized), -1)[description.cat.codes.to_numpy()]
+        df['description'] = pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+    else:
+        df['description'] = description.str.capitalize()
     return df
 
 def fill_missing(df: pd.DataFrame) -> pd.DataFrame:
-    """Fills missing values: uses np.nan for numerics, 'NA' for strings."""
-    string_cols = ['source', 'timestamp', 'aqi', 'aqi_open_meteo', 'description']
-    numeric_cols = ['humidity', 'wind_speed', 'temp_k', 'feels_like', 'temp_celsius', 'feels_like_temp', 'weather_score']
+    """
+    Normalizes missing values to typed nulls: NaN for numerics, a missing
+    value for strings, "NA" placeholders included. The outputs write them as "NA".
+    """
+    string_cols = ['source', 'description']
+    numeric_cols = [
+        'humidity', 'wind_speed', 'temp_k', 'feels_like', 'temp_celsius', 'feels_like_temp', 'weather_score',
+        'aqi', 'aqi_open_meteo'
+    ]
 
     for col in string_cols:
-        if col in df.columns:
-            df[col] = df[col].astype('object')
-            df[col] = df[col].fillna("NA")
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if "NA" in df[col].cat.categories:
+                df[col] = df[col].cat.remove_categories("NA")
+        else:
+            df[col] = df[col].mask(df[col] == "NA")
     for col in numeric_cols:
-        if col in df.columns:
-            df[col] = df[col].fillna(np.nan)
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
     return df
 
 class TransformerPipeline:
@@ -1,15 +1,138 @@
+import asyncio
+import csv
+import os
 import aiofiles
 import pandas as pd
-from io import StringIO
-
-async def async_read_csv(filepath: str) -> pd.DataFrame:
-    async with aiofiles.open(filepath, mode='r') as f:
-        content = await f.read()
-    df = pd.read_csv(StringIO(content))
-    # Convert all columns to object dtype to allow safe filling with "NA"
-    df = df.astype('object')
-    df.fillna("NA", inplace=True)
-    return df
+from typing import AsyncIterator, Dict, Optional
+from utils.schema import conform
+
+# Explicit schema for historical_weather_data.csv so pandas never has to guess.
+# Timestamps are read as text and parsed to datetime64 by conform().
+HISTORY_DTYPES = {
+    "city": "category",
+    "temp_k": "float32",
+    "humidity": "float32",
+    "wind_speed": "float32",
+    "description": "category",
+    "timestamp": str,
+    "source": "category",
+}
+
+# Bytes read per step when scanning back from the end of a file for a newline
+_TAIL_BLOCK = 64 * 1024
+
+def complete_lines_end(filepath: str, size: Optional[int] = None) -> int:
+    """
+    Byte offset just past the last newline at or before size (the file size by default).
+
+    A writer appending to the file may not have finished its last line yet;
+    reading only up to here leaves that line for the next read instead of
+    parsing half a row.
+    """
+    with open(filepath, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size if size is None else size
+        while end > 0:
+            start = max(0, end - _TAIL_BLOCK)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+class _ByteRange:
+    """Read-only view of a binary file that stops at a fixed end offset."""
+    def __init__(self, handle, end: int):
+        self._handle = handle
+        self.remaining = max(0, end - handle.tell())
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _open_csv_range(filepath: str, offset: int, end: Optional[int]):
+    """
+    Opens filepath positioned at a byte offset, bounded by end (by default the
+    end of the last complete line).
+
+    Returns the handle to parse and extra read_csv arguments. When starting past
+    the header line, the column names are taken from the first line of the file.
+    """
+    handle = open(filepath, 'rb')
+    kwargs = {}
+    if offset > 0:
+        header_line = handle.readline().decode('utf-8')
+        kwargs = {'header': None, 'names': next(csv.reader([header_line]))}
+        handle.seek(max(offset, handle.tell()))
+    end = complete_lines_end(filepath) if end is None else end
+    return _ByteRange(handle, end), kwargs
+
+async def async_iter_csv(
+    filepath: str,
+    chunksize: int = 100_000,
+    dtype: Optional[Dict[str, object]] = None,
+    offset: int = 0,
+    end: Optional[int] = None
+) -> AsyncIterator[pd.DataFrame]:
+    """
+    Streams a CSV file as typed DataFrame chunks.
+
+    Parsing runs in a worker thread one chunk at a time, so at most one chunk
+    is held in memory and the event loop is never blocked by pandas.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        chunksize (int): Number of rows per chunk.
+        dtype (dict, optional): Column dtypes. Defaults to HISTORY_DTYPES, with the
+            chunks conformed to the typed record schema.
+        offset (int): Byte offset to start reading rows from (0 reads the whole file).
+        end (int, optional): Byte offset to stop at. Defaults to the end of the last
+            complete line, so a line still being appended is left for the next read.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows.
+    """
+    handle, kwargs = await asyncio.to_thread(_open_csv_range, filepath, offset, end)
+    with handle:
+        if not handle.remaining:
+            return
+        reader = await asyncio.to_thread(
+            pd.read_csv, handle, chunksize=chunksize, dtype=HISTORY_DTYPES if dtype is None else dtype, **kwargs
+        )
+        with reader:
+            while True:
+                chunk = await asyncio.to_thread(next, reader, None)
+                if chunk is None:
+                    break
+                yield conform(chunk) if dtype is None else chunk
+
+async def async_read_csv(
+    filepath: str,
+    dtype: Optional[Dict[str, object]] = None,
+    offset: int = 0,
+    end: Optional[int] = None
+) -> pd.DataFrame:
+    def read_range() -> pd.DataFrame:
+        handle, kwargs = _open_csv_range(filepath, offset, end)
+        with handle:
+            if not handle.remaining:
+                return pd.DataFrame()
+            if dtype is not None:
+                return pd.read_csv(handle, dtype=dtype, **kwargs)
+            return conform(pd.read_csv(handle, dtype=HISTORY_DTYPES, **kwargs))
+    return await asyncio.to_thread(read_range)
 
 async def async_write_csv(df: pd.DataFrame, filepath: str):
     csv_str = df.to_csv(index=False)
@@ -0,0 +1,95 @@
+import os
+import json
+import logging
+import pandas as pd
+from typing import Dict, Tuple
+from config import STATE_FILE
+from utils.async_fileio import complete_lines_end
+
+class Checkpoint:
+    """
+    High-water marks for incremental runs, persisted as a JSON state file.
+
+    Two kinds of marks are kept: the byte offset already consumed from each
+    input file, and the latest timestamp written per source and city. The
+    offset alone decides which file rows are new; the timestamps filter
+    records fetched again from the APIs.
+    """
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self.files: Dict[str, int] = {}
+        self.timestamps: Dict[str, Dict[str, str]] = {}
+
+    def load(self) -> "Checkpoint":
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read checkpoint {self.path}, starting from scratch: {e}")
+            return self
+        self.files = state.get("files", {})
+        self.timestamps = state.get("timestamps", {})
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.files, "timestamps": self.timestamps}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.files = {}
+        self.timestamps = {}
+
+    def file_range(self, filepath: str) -> Tuple[int, int]:
+        """
+        Returns the (offset, end) byte range of filepath not yet consumed.
+
+        end stops after the last complete line, so a row still being appended
+        is neither parsed half-written nor skipped once it is finished.
+        """
+        size = os.path.getsize(filepath)
+        offset = self.files.get(os.path.abspath(filepath), 0)
+        if offset > size:
+            logging.warning(f"{filepath} is smaller than its checkpoint, reading it from the start")
+            offset = 0
+        return offset, max(offset, complete_lines_end(filepath, size))
+
+    def commit_file(self, filepath: str, end: int):
+        self.files[os.path.abspath(filepath)] = end
+
+    def filter_new(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drops rows at or before the high-water mark of their source and city."""
+        if df.empty or not self.timestamps or 'timestamp' not in df.columns:
+            return df
+        marks = pd.DataFrame(
+            [(source, city, ts) for source, cities in self.timestamps.items() for city, ts in cities.items()],
+            columns=['source', 'city', 'high_water_mark']
+        )
+        keys = df[['source', 'city']].astype(object)
+        high_water = keys.merge(marks, on=['source', 'city'], how='left')['high_water_mark']
+        high_water = pd.to_datetime(high_water, errors='coerce', format='ISO8601').to_numpy()
+        ts = pd.to_datetime(df['timestamp'], errors='coerce', format='ISO8601').to_numpy()
+        # Rows without a usable timestamp cannot be checkpointed, so they always pass
+        keep = pd.isna(high_water) | pd.isna(ts) | (ts > high_water)
+        dropped = len(df) - int(keep.sum())
+        if dropped:
+            logging.info(f"Skipped {dropped} rows already written by a previous run")
+        return df[keep]
+
+    def advance(self, df: pd.DataFrame):
+        """Moves the per source/city high-water marks up to the newest timestamps in df."""
+        if df.empty or 'timestamp' not in df.columns:
+            return
+        ts = pd.to_datetime(df['timestamp'], errors='coerce', format='ISO8601')
+        latest = (
+            df[['source', 'city']].astype(object).assign(ts=ts)
+            .dropna(subset=['ts'])
+            .groupby(['source', 'city'])['ts'].max()
+        )
+        for (source, city), newest in latest.items():
+            current = self.timestamps.get(source, {}).get(city)
+            if current is None or newest > pd.Timestamp(current):
+                self.timestamps.setdefault(source, {})[city] = newest.isoformat()
\ No newline at end of file
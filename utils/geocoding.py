@@ -0,0 +1,204 @@
+import os
+import re
+import csv
+import sqlite3
+import logging
+import unicodedata
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from config import GAZETTEER_CSV, GAZETTEER_DB
+
+# Columns of a GeoNames dump (cities15000.txt, allCountries.txt...), which has no header row
+GEONAMES_COLUMNS = (
+    "geonameid", "name", "asciiname", "alternatenames", "latitude", "longitude", "feature_class",
+    "feature_code", "country_code", "cc2", "admin1_code", "admin2_code", "admin3_code", "admin4_code",
+    "population", "elevation", "dem", "timezone", "modification_date"
+)
+# Rows inserted per executemany while building the index
+BUILD_BATCH = 10_000
+
+_active_gazetteer: Optional["Gazetteer"] = None
+_default_gazetteer: Optional["Gazetteer"] = None
+
+def normalize(name: str) -> str:
+    """Lookup key of a place name: accents stripped, case folded, punctuation and spacing collapsed."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"\W+", " ", stripped.casefold()).split())
+
+def _read_places(path: str) -> Iterator[Dict[str, str]]:
+    """Rows of a gazetteer file: a GeoNames dump, or a CSV/TSV with a header naming the same columns."""
+    with open(path, newline='', encoding='utf-8') as f:
+        first = f.readline()
+        f.seek(0)
+        delimiter = "\t" if "\t" in first else ","
+        if "latitude" in first:
+            yield from csv.DictReader(f, delimiter=delimiter)
+        else:
+            yield from csv.DictReader(f, fieldnames=GEONAMES_COLUMNS, delimiter=delimiter, quoting=csv.QUOTE_NONE)
+
+def _population(value: Optional[str]) -> int:
+    try:
+        return int(value or 0)
+    except ValueError:
+        return 0
+
+class Gazetteer:
+    """
+    City coordinates from a local gazetteer file, indexed in SQLite.
+
+    The file is built once into db_path, with every name, ASCII name and
+    alternate name of a place stored under its normalize() key, so lookups are
+    case-, accent- and punctuation-insensitive. The index is rebuilt when the
+    file changes and opened on the first lookup. A name shared by several
+    places resolves to the one whose main name matches, then to the most
+    populous; "London, CA" restricts the match to a country code. Lookups,
+    misses included, are memoised for the life of the process.
+    """
+    def __init__(self, csv_path: str = GAZETTEER_CSV, db_path: str = GAZETTEER_DB):
+        self.csv_path = csv_path
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+        self._memo: Dict[str, Optional[Tuple[float, float]]] = {}
+
+    def _source_version(self) -> Optional[str]:
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(self.csv_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _indexed_version(self) -> Optional[str]:
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def build(self) -> int:
+        """Builds the index from the gazetteer file and returns the number of places in it."""
+        version = self._source_version()
+        if version is None:
+            raise FileNotFoundError(f"Gazetteer file {self.csv_path} not found")
+        self.close()
+        # Built next to the index and swapped in, so a failed build leaves the old index usable
+        tmp_path = f"{self.db_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(
+            "CREATE TABLE places (id INTEGER PRIMARY KEY, name TEXT, country TEXT, "
+            "latitude REAL, longitude REAL, population INTEGER)"
+        )
+        # rank 0 for a place's main or ASCII name, 1 for its alternate names
+        conn.execute("CREATE TABLE names (key TEXT, place INTEGER, rank INTEGER)")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        places, names, count = [], [], 0
+        for row in _read_places(self.csv_path):
+            try:
+                latitude, longitude = float(row["latitude"]), float(row["longitude"])
+            except (TypeError, ValueError):
+                continue
+            count += 1
+            keys = {}
+            for name in (row.get("name"), row.get("asciiname")):
+                if name:
+                    keys.setdefault(normalize(name), 0)
+            for name in (row.get("alternatenames") or "").split(","):
+                if name:
+                    keys.setdefault(normalize(name), 1)
+            places.append((
+                count, row.get("name"), (row.get("country_code") or "").upper(),
+                latitude, longitude, _population(row.get("population"))
+            ))
+            names.extend((key, count, rank) for key, rank in keys.items() if key)
+            if len(places) >= BUILD_BATCH:
+                self._insert(conn, places, names)
+                places, names = [], []
+        self._insert(conn, places, names)
+        conn.execute("CREATE INDEX names_key ON names (key)")
+        conn.execute("INSERT INTO meta VALUES ('source', ?)", (version,))
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, self.db_path)
+        self._memo.clear()
+        logging.info(f"Built gazetteer index {self.db_path} with {count} places from {self.csv_path}")
+        return count
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, places, names):
+        conn.executemany("INSERT INTO places VALUES (?, ?, ?, ?, ?, ?)", places)
+        conn.executemany("INSERT INTO names VALUES (?, ?, ?)", names)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self._opened:
+            version = self._source_version()
+            if version is not None and version != self._indexed_version():
+                self.build()
+            self._opened = True
+            if os.path.exists(self.db_path):
+                self._conn = sqlite3.connect(self.db_path)
+            else:
+                logging.warning(f"No gazetteer at {self.csv_path} or {self.db_path}; cities cannot be located")
+        return self._conn
+
+    def lookup(self, city: str) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) of city, or None if the gazetteer does not know it."""
+        if city in self._memo:
+            return self._memo[city]
+        conn = self._connection()
+        coords = None
+        if conn is not None:
+            name, country = city, None
+            head, _, tail = city.rpartition(",")
+            if head and len(tail.strip()) == 2:
+                name, country = head, tail.strip().upper()
+            query = (
+                "SELECT p.latitude, p.longitude FROM names n JOIN places p ON p.id = n.place "
+                "WHERE n.key = ?" + (" AND p.country = ?" if country else "") +
+                " ORDER BY n.rank, p.population DESC LIMIT 1"
+            )
+            row = conn.execute(query, (normalize(name), country) if country else (normalize(name),)).fetchone()
+            coords = tuple(row) if row else None
+        self._memo[city] = coords
+        return coords
+
+    def locate(self, cities: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+        """Coordinates of the cities the gazetteer knows, keyed by city."""
+        located = {}
+        for city in cities:
+            coords = self.lookup(city)
+            if coords is not None:
+                located[city] = coords
+        return located
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._opened = False
+
+def use_gazetteer(gazetteer: Optional[Gazetteer]):
+    """Sets the gazetteer used to locate cities; None falls back to the one configured in config.py."""
+    global _active_gazetteer
+    _active_gazetteer = gazetteer
+
+def gazetteer() -> Gazetteer:
+    global _default_gazetteer
+    if _active_gazetteer is not None:
+        return _active_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer()
+    return _default_gazetteer
+
+def coordinates(city: str) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) of city from the active gazetteer, or None if unknown."""
+    return gazetteer().lookup(city)
\ No newline at end of file
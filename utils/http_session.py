@@ -0,0 +1,73 @@
+import logging
+import aiohttp
+from typing import Optional
+from config import (
+    HTTP_POOL_SIZE, HTTP_POOL_PER_HOST, HTTP_KEEPALIVE_TIMEOUT, HTTP_DNS_CACHE_TTL,
+    HTTP_TIMEOUT_TOTAL, HTTP_TIMEOUT_CONNECT, HTTP_TIMEOUT_READ, HTTP_AUTO_DECOMPRESS
+)
+from utils.metrics import count
+
+class ConnectionStats:
+    """Counts new vs reused connections, DNS cache hits and response bytes through aiohttp tracing."""
+    def __init__(self):
+        self.created = 0
+        self.reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+        self.requests = 0
+        self.bytes_received = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._count("requests"))
+        trace.on_connection_create_end.append(self._count("created"))
+        trace.on_connection_reuseconn.append(self._count("reused"))
+        trace.on_dns_cache_hit.append(self._count("dns_hits"))
+        trace.on_dns_cache_miss.append(self._count("dns_misses"))
+        trace.on_response_chunk_received.append(self._received)
+        return trace
+
+    def log(self):
+        connections = self.created + self.reused
+        reuse = self.reused / connections if connections else 0.0
+        logging.info(
+            f"HTTP pool: {self.requests} requests, {self.created} new connections, {self.reused} reused "
+            f"({reuse:.0%} reuse), DNS cache {self.dns_hits} hits / {self.dns_misses} misses, "
+            f"{self.bytes_received / 1e6:.1f} MB received"
+        )
+
+    async def _received(self, session, context, params):
+        self.bytes_received += len(params.chunk)
+        count("bytes_fetched", params.url.host, len(params.chunk))
+
+    def _count(self, attr: str):
+        async def handler(session, context, params):
+            setattr(self, attr, getattr(self, attr) + 1)
+        return handler
+
+def create_session(stats: Optional[ConnectionStats] = None) -> aiohttp.ClientSession:
+    """
+    Builds the ClientSession shared by all input sources.
+
+    The connector bounds the pool overall and per host, keeps idle connections
+    alive between requests and caches DNS lookups. Every request gets total,
+    connect and read timeouts, so one hung upstream cannot stall the run.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=HTTP_TIMEOUT_TOTAL,
+        connect=HTTP_TIMEOUT_CONNECT,
+        sock_read=HTTP_TIMEOUT_READ
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        auto_decompress=HTTP_AUTO_DECOMPRESS,
+        trace_configs=[stats.trace_config()] if stats else None
+    )
\ No newline at end of file
@@ -1,20 +1,108 @@
+import sys
+import json
+import time
+import queue
+import random
+import atexit
 import logging
 from datetime import datetime
-import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from config import LOG_FORMAT, LOG_FETCH_LEVEL, LOG_FETCH_SAMPLE
+from utils.retry import current_attempt
+
+# Per-request fetch lines go through their own logger, so they can be sampled or downgraded on their own
+FETCH_LOGGER = logging.getLogger("pipeline.fetch")
+# Fields passed through extra= that structured records carry
+RECORD_FIELDS = ("city", "source", "latency_ms", "attempt", "status")
+
+_listener: Optional[QueueListener] = None
+_fetch_level = logging.INFO
+_fetch_sample = 1.0
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any RECORD_FIELDS set on the record."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler that does not flush after every record.
+
+    Lines collect in the file's write buffer and are flushed in batches by
+    _BatchingListener whenever the log queue runs empty, and on close.
+    """
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
 
-def setup_daily_log():
+class _ThreadQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener is a thread of this process, so the record needs no pickling or
+        # pre-formatting; only the arguments are merged now, in case they change later
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+class _BatchingListener(QueueListener):
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            # Everything queued so far is written: flush once, then wait for more
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+def setup_daily_log(log_format: str = LOG_FORMAT, fetch_level: str = LOG_FETCH_LEVEL, fetch_sample: float = LOG_FETCH_SAMPLE):
+    """
+    Logs to weather_run_YYYY-MM-DD.log without blocking the event loop.
+
+    Callers only put records on an in-memory queue (QueueHandler); a
+    background QueueListener thread formats them and writes them to the file,
+    flushing in batches. log_format is "json" for structured records or
+    "text" for the classic format. fetch_level and fetch_sample control the
+    per-request fetch lines: they are logged at fetch_level, so "DEBUG"
+    downgrades them out of the log, and a sample below 1 keeps only that
+    fraction. Calling it again (a new day in serve
+    mode) stops the previous listener after it has drained.
+    """
+    global _listener, _fetch_level, _fetch_sample
     transaction_date = datetime.now().strftime("%Y-%m-%d")
     log_filename = f"weather_run_{transaction_date}.log"
-    file_handler = logging.FileHandler(log_filename, mode='a', encoding='utf-8')
-    formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
-    file_handler.setFormatter(formatter)
+    file_handler = BufferedFileHandler(log_filename, mode='a', encoding='utf-8')
+    if log_format == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
     root_logger = logging.getLogger()
     # Remove all handlers before adding (avoid duplicate logs)
     if root_logger.hasHandlers():
         root_logger.handlers.clear()
-    root_logger.addHandler(file_handler)
+    stop_log()
+    log_queue = queue.SimpleQueue()
+    _listener = _BatchingListener(log_queue, file_handler)
+    _listener.start()
+    root_logger.addHandler(_ThreadQueueHandler(log_queue))
     # Set level to INFO to capture all steps, not just errors
     root_logger.setLevel(logging.INFO)
+    _fetch_level = logging.getLevelName(fetch_level) if isinstance(fetch_level, str) else fetch_level
+    _fetch_sample = fetch_sample
     def handle_exception(exc_type, exc_value, exc_traceback):
         if issubclass(exc_type, KeyboardInterrupt):
             sys.__excepthook__(exc_type, exc_value, exc_traceback)
@@ -22,18 +110,33 @@ def setup_daily_log():
         logging.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
     sys.excepthook = handle_exception
 
-def async_retry(retries=3, delay=2):
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            last_exc = None
-            for attempt in range(1, retries + 1):
-                try:
-                    return await func(*args, **kwargs)
-                except Exception as e:
-                    last_exc = e
-                    logging.warning(f"Retry {attempt}/{retries} for {func.__name__} due to error: {e}")
-                    await asyncio.sleep(delay)
-            logging.error(f"All retries failed for {func.__name__}: {last_exc}")
-            raise last_exc
-        return wrapper
-    return decorator
\ No newline at end of file
+def stop_log():
+    """Drains the log queue and closes the file; registered to run at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(stop_log)
+
+def log_fetch(message: str, city: Optional[str], source: str, started: float, **fields):
+    """
+    Logs one per-request fetch line with its city, source, latency since
+    started (a time.perf_counter() value) and retry attempt.
+
+    Lines that are sampled out or below the log level return before a log
+    record is even created, so they cost the event loop next to nothing.
+    """
+    if not FETCH_LOGGER.isEnabledFor(_fetch_level):
+        return
+    if _fetch_sample < 1 and random.random() >= _fetch_sample:
+        return
+    FETCH_LOGGER.log(_fetch_level, message, extra={
+        "city": city,
+        "source": source,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "attempt": current_attempt(),
+        **fields
+    })
\ No newline at end of file
@@ -0,0 +1,131 @@
+from typing import Any, Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_DAY = 86_400 * NS_PER_SECOND
+_NAT = np.iinfo(np.int64).min
+
+def parse_timestamps(values) -> np.ndarray:
+    """ISO timestamps as int64 nanoseconds since the epoch; unparseable or missing values become NaT."""
+    if not isinstance(values, pd.Series):
+        values = pd.Series(values, dtype=object)
+    parsed = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    if getattr(parsed.dt, 'tz', None) is not None:
+        parsed = parsed.dt.tz_convert('UTC').dt.tz_localize(None)
+    return parsed.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+def _typed(values: pd.Series) -> np.ndarray:
+    # Measurements keep their float dtype, so joined columns come out float32 with NaN
+    values = values.to_numpy()
+    return values if values.dtype.kind == 'f' else values.astype(object)
+
+class ReadingIndex:
+    """
+    Readings of one enrichment source, indexed for joining onto weather rows.
+
+    Keys are typed once when the index is built: cities become integer codes
+    through a hash index and timestamps int64 nanoseconds. on gives the exact
+    keys, "city" and optionally "date" (the day of the timestamp); the latest
+    reading per key wins. With a tolerance in seconds the join is as-of
+    instead: each row gets the latest reading of its city taken at or
+    before its own timestamp, if it is at most tolerance seconds older.
+    Readings after the row are never used, so an hourly series that
+    continues into a forecast cannot lend a row a value from its future.
+    """
+    def __init__(self, fields: Sequence[str], on: Sequence[str] = ("city",), tolerance: Optional[float] = None):
+        self.fields = list(fields)
+        self.by_date = 'date' in on
+        self.tolerance = None if tolerance is None else int(tolerance * NS_PER_SECOND)
+        self._cities = pd.Index([], dtype=object)
+        self._codes = np.empty(0, dtype=np.int64)
+        self._times = np.empty(0, dtype=np.int64)
+        self._values: Dict[str, np.ndarray] = {field: np.empty(0, dtype=object) for field in self.fields}
+        self._keys = pd.Index([], dtype=np.int64)
+        self._last = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def build(self, records: Union[pd.DataFrame, Iterable[Dict[str, Any]]]) -> "ReadingIndex":
+        columns = ['city', 'timestamp', *self.fields]
+        if isinstance(records, pd.DataFrame):
+            df = records.reindex(columns=columns)
+        else:
+            df = pd.DataFrame(list(records), columns=columns)
+        times = parse_timestamps(df['timestamp'])
+        # Readings without a time (failed fetches) cannot be placed and would only add "NA"
+        keep = (times != _NAT) & df['city'].notna().to_numpy()
+        df, times = df[keep], times[keep]
+        codes, cities = pd.factorize(df['city'])
+        order = np.lexsort((times, codes))
+        self._cities = pd.Index(np.asarray(cities, dtype=object))
+        self._codes = codes[order].astype(np.int64)
+        self._times = times[order]
+        self._values = {field: _typed(df[field])[order] for field in self.fields}
+        if self.tolerance is None:
+            keys = self._exact_keys(self._codes, self._times)
+            # Sorted by time within each key, so the last occurrence is the latest reading
+            self._last = np.flatnonzero(np.append(keys[1:] != keys[:-1], True)) if len(keys) else keys
+            self._keys = pd.Index(keys[self._last])
+        return self
+
+    def lookup(self, cities, timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Values of every field for each (city, timestamp) row, NaN where nothing matches.
+        Float fields keep their dtype, others come back as objects.
+
+        timestamps are int64 nanoseconds as returned by parse_timestamps.
+        """
+        codes = self._cities.get_indexer(pd.Index(np.asarray(cities, dtype=object))).astype(np.int64)
+        if self.tolerance is None:
+            positions = self._lookup_exact(codes, timestamps)
+        else:
+            positions = self._lookup_asof(codes, timestamps)
+        found = positions >= 0
+        result = {}
+        for field, values in self._values.items():
+            column = np.full(len(positions), np.nan, dtype=values.dtype if values.dtype.kind == 'f' else object)
+            column[found] = values[positions[found]]
+            result[field] = column
+        return result
+
+    def _exact_keys(self, codes: np.ndarray, times: np.ndarray) -> np.ndarray:
+        if not self.by_date:
+            return codes
+        # One key per (city, day): the day number fits far below the code stride
+        return codes * (1 << 32) + np.floor_divide(times, NS_PER_DAY)
+
+    def _lookup_exact(self, codes: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        if not len(self._keys):
+            return np.full(len(codes), -1, dtype=np.int64)
+        hits = self._keys.get_indexer(self._exact_keys(codes, timestamps))
+        valid = (codes >= 0) & (hits >= 0)
+        if self.by_date:
+            valid &= timestamps != _NAT
+        return np.where(valid, self._last[hits], -1)
+
+    def _lookup_asof(self, codes: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        count = len(self._times)
+        positions = np.full(len(codes), -1, dtype=np.int64)
+        if not count:
+            return positions
+        # Sort readings and rows together by (city, time), readings first on equal times;
+        # readings are already in that order, so a running max over reading positions
+        # gives each row the last reading at or before it
+        order = np.lexsort((
+            np.r_[np.zeros(count, dtype=np.int8), np.ones(len(codes), dtype=np.int8)],
+            np.r_[self._times, timestamps],
+            np.r_[self._codes, codes]
+        ))
+        is_reading = order < count
+        before = np.maximum.accumulate(np.where(is_reading, order, -1))
+        rows = ~is_reading
+        candidate = np.full(len(codes), -1, dtype=np.int64)
+        candidate[order[rows] - count] = before[rows]
+        inside = (codes >= 0) & (timestamps != _NAT) & (candidate >= 0)
+        inside[inside] &= self._codes[candidate[inside]] == codes[inside]
+        inside[inside] &= timestamps[inside] - self._times[candidate[inside]] <= self.tolerance
+        positions[inside] = candidate[inside]
+        return positions
\ No newline at end of file
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import bisect
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets; a last bucket takes everything slower
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = "weather_pipeline"
+
+_active_metrics: Optional["RunMetrics"] = None
+
+class StageMetrics:
+    """
+    Latency samples, item counts and backpressure time for one pipeline stage.
+
+    observe() records how long the stage spent on one unit of work, the rows
+    it took in and gave out, and the bytes it read or wrote; the latency also
+    goes into a histogram over LATENCY_BUCKETS. blocked accumulates the time
+    the stage waited on a full downstream queue, which shows where the graph
+    is throttled by a slower consumer.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.rows_out = 0
+        self.bytes = 0
+        self.errors = 0
+        self.blocked = 0.0
+        self.samples: List[float] = []
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float, items: int = 1, rows_out: Optional[int] = None, nbytes: int = 0):
+        self.samples.append(seconds)
+        self.items += items
+        self.rows_out += items if rows_out is None else rows_out
+        self.bytes += nbytes
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        """The stage's figures as plain numbers, e.g. for a JSON report; seconds is the sum of all samples."""
+        return {
+            "batches": len(self.samples),
+            "items": self.items,
+            "rows_out": self.rows_out,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "seconds": round(sum(self.samples), 6),
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(max(self.samples, default=0.0) * 1000, 3),
+            "blocked_s": round(self.blocked, 6),
+            "histogram": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+        }
+
+    def log(self):
+        if not self.samples:
+            logging.info(f"Stage {self.name}: idle")
+            return
+        mean = sum(self.samples) / len(self.samples)
+        logging.info(
+            f"Stage {self.name}: {len(self.samples)} batches, {self.items} items, "
+            f"latency avg {mean * 1000:.1f}ms p50 {self.percentile(0.5) * 1000:.1f}ms "
+            f"p95 {self.percentile(0.95) * 1000:.1f}ms max {max(self.samples) * 1000:.1f}ms, "
+            f"blocked {self.blocked:.2f}s on a full queue"
+        )
+
+class RunMetrics:
+    """
+    Instrumentation of one run (or one serve cycle).
+
+    Stages are keyed by (stage, name): the pipeline stages themselves
+    ("fetch", "transform"...) have an empty name, and their parts are broken
+    down by name, e.g. ("source", "OpenAQInput"), ("transformer",
+    "fill_missing") or ("output", "CSVOutput"). metrics["fetch"] is the
+    stage's StageMetrics, created on first use. Event counters (cache hits,
+    retries, bytes fetched...) are counted per label through count(),
+    usually by the module-level count() of whichever run is active.
+    """
+    def __init__(self, stages: Iterable[str] = ()):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.rows_written = 0
+        self.stages: Dict[Tuple[str, str], StageMetrics] = {}
+        self.counters: Dict[str, Counter] = defaultdict(Counter)
+        for stage in stages:
+            self.stage(stage)
+
+    def stage(self, stage: str, name: str = "") -> StageMetrics:
+        key = (stage, name)
+        if key not in self.stages:
+            self.stages[key] = StageMetrics(f"{stage} {name}" if name else stage)
+        return self.stages[key]
+
+    def __getitem__(self, stage: str) -> StageMetrics:
+        return self.stage(stage)
+
+    def count(self, counter: str, label: str = "", value: float = 1):
+        self.counters[counter][label] += value
+
+    def finish(self, rows_written: int = 0):
+        self.finished = time.time()
+        self.rows_written = rows_written or 0
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def log(self):
+        for stage in self.stages.values():
+            stage.log()
+        for counter, values in sorted(self.counters.items()):
+            figures = ", ".join(f"{label or 'all'} {value:g}" for label, value in sorted(values.items()))
+            logging.info(f"Counter {counter}: {figures}")
+
+    def summary(self) -> Dict[str, Any]:
+        """The run as a JSON-serialisable dict."""
+        stages: Dict[str, Any] = {}
+        for (stage, name), metrics in self.stages.items():
+            if name:
+                stages.setdefault(f"{stage}s", {})[name] = metrics.summary()
+            else:
+                stages[stage] = metrics.summary()
+        return {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "duration_s": round(self.duration, 6),
+            "rows_written": self.rows_written,
+            "stages": stages,
+            "counters": {counter: dict(values) for counter, values in sorted(self.counters.items())},
+        }
+
+    def prometheus(self) -> str:
+        """The run in the Prometheus text exposition format, as read by node_exporter's textfile collector."""
+        lines = []
+        def family(metric: str, kind: str, help_text: str):
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+        def sample(metric: str, labels: Dict[str, str], value: float):
+            text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{METRIC_PREFIX}_{metric}{{{text}}} {value:g}" if text else f"{METRIC_PREFIX}_{metric} {value:g}")
+
+        family("stage_duration_seconds", "histogram", "Time per unit of work of a stage.")
+        for (stage, name), metrics in self.stages.items():
+            labels = {"stage": stage, "name": name}
+            cumulative = 0
+            for bound, count in zip([*map(str, LATENCY_BUCKETS), "+Inf"], metrics.buckets):
+                cumulative += count
+                sample("stage_duration_seconds_bucket", {**labels, "le": bound}, cumulative)
+            sample("stage_duration_seconds_sum", labels, sum(metrics.samples))
+            sample("stage_duration_seconds_count", labels, len(metrics.samples))
+        for field, metric, help_text in (
+            ("items", "stage_rows_in_total", "Rows taken in by a stage."),
+            ("rows_out", "stage_rows_out_total", "Rows given out by a stage."),
+            ("bytes", "stage_bytes_total", "Bytes read or written by a stage."),
+            ("errors", "stage_errors_total", "Failures of a stage."),
+            ("blocked", "stage_blocked_seconds_total", "Time a stage waited on a full downstream queue."),
+        ):
+            family(metric, "counter", help_text)
+            for (stage, name), metrics in self.stages.items():
+                sample(metric, {"stage": stage, "name": name}, getattr(metrics, field))
+        for counter, values in sorted(self.counters.items()):
+            family(f"{counter}_total", "counter", f"Count of {counter.replace('_', ' ')}.")
+            for label, value in sorted(values.items()):
+                sample(f"{counter}_total", {"key": label}, value)
+        family("run_duration_seconds", "gauge", "Duration of the run.")
+        sample("run_duration_seconds", {}, self.duration)
+        family("run_rows_written", "gauge", "Rows written by the run.")
+        sample("run_rows_written", {}, self.rows_written)
+        family("run_timestamp_seconds", "gauge", "Start of the run, in seconds since the epoch.")
+        sample("run_timestamp_seconds", {}, self.started)
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, path: str):
+        _write_atomic(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path: str):
+        _write_atomic(path, self.prometheus())
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _write_atomic(path: str, text: str):
+    # The textfile collector may read at any moment, so the file is swapped in whole
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def use_metrics(metrics: Optional[RunMetrics]):
+    """Sets the run that count() and current_metrics() report to; None turns counting off."""
+    global _active_metrics
+    _active_metrics = metrics
+
+def current_metrics() -> Optional[RunMetrics]:
+    return _active_metrics
+
+def count(counter: str, label: str = "", value: float = 1):
+    """Adds value to the counter of the active run, if any, e.g. count("cache_hits", "openaq")."""
+    if _active_metrics is not None:
+        _active_metrics.count(counter, label, value)
\ No newline at end of file
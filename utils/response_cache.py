@@ -0,0 +1,191 @@
+import json
+import time
+import sqlite3
+import logging
+import functools
+import contextvars
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from config import CACHE_FILE, CACHE_MAX_ENTRIES, CACHE_TTLS
+from utils.metrics import count
+
+# Returned by a fetch when the server answered 304 to a conditional request
+NOT_MODIFIED = object()
+
+_active_cache: Optional["ResponseCache"] = None
+# Validators of the stale entry being revalidated, and those of the fresh response
+_validators: contextvars.ContextVar[Optional[Dict[str, Optional[str]]]] = contextvars.ContextVar("validators", default=None)
+
+class ResponseCache:
+    """
+    On-disk cache of fetched records, stored in SQLite.
+
+    Entries are keyed by source, city and request parameters. Each source has
+    its own TTL, the least recently used entries are evicted above max_entries,
+    and stale entries carrying an ETag or Last-Modified are revalidated with a
+    conditional request instead of being fetched again.
+    """
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = CACHE_MAX_ENTRIES, ttls: Dict[str, int] = CACHE_TTLS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.hits = Counter()
+        self.misses = Counter()
+        self.revalidated = Counter()
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, source TEXT, value TEXT, etag TEXT, last_modified TEXT, "
+            "stored_at REAL, last_used REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT source, value, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        source, value, etag, last_modified, stored_at = row
+        now = time.time()
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return {
+            "value": json.loads(value),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": now - stored_at < self.ttls.get(source, 0)
+        }
+
+    def put(self, key: str, source: str, value: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, source, json.dumps(value), etag, last_modified, now, now)
+        )
+
+    def touch(self, key: str):
+        """Marks an entry fresh again after the server confirmed it is unchanged."""
+        now = time.time()
+        self._conn.execute("UPDATE responses SET stored_at = ?, last_used = ? WHERE key = ?", (now, now, key))
+
+    def evict(self) -> int:
+        """Drops the least recently used entries above max_entries."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)", (excess,)
+        )
+        return excess
+
+    def log_stats(self):
+        for source in sorted(set(self.hits) | set(self.misses)):
+            logging.info(
+                f"Response cache for {source}: {self.hits[source]} hits, {self.misses[source]} misses, "
+                f"{self.revalidated[source]} revalidated"
+            )
+
+    def flush(self):
+        """Evicts over-limit entries and commits, so a long-running process persists its cache."""
+        evicted = self.evict()
+        if evicted:
+            logging.info(f"Evicted {evicted} least recently used entries from response cache")
+        self._conn.commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+def use_cache(cache: Optional[ResponseCache]):
+    """Sets the cache used by cached fetches; None disables caching."""
+    global _active_cache
+    _active_cache = cache
+
+def conditional_headers() -> Dict[str, str]:
+    """Request headers that revalidate the stale cache entry of the current fetch, if any."""
+    validators = _validators.get()
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def remember_validators(resp):
+    """Records the ETag/Last-Modified of a response so they are stored with the cached record."""
+    validators = _validators.get()
+    if validators is not None:
+        validators["etag"] = resp.headers.get("ETag")
+        validators["last_modified"] = resp.headers.get("Last-Modified")
+
+def _key(source: str, city: str, args, kwargs) -> str:
+    return json.dumps([source, city, list(args), kwargs], sort_keys=True, default=str)
+
+def _cacheable(record: Any) -> bool:
+    # Failed fetches come back as placeholder records without a timestamp
+    return isinstance(record, dict) and record.get("timestamp") is not None
+
+def cached(source: str):
+    """Caches fetch(session, city, ...) results per city for the source's TTL."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(session, city, *args, **kwargs):
+            cache = _active_cache
+            if cache is None:
+                return await func(session, city, *args, **kwargs)
+            key = _key(source, city, args, kwargs)
+            entry = cache.get(key)
+            if entry is not None and entry["fresh"]:
+                cache.hits[source] += 1
+                count("cache_hits", source)
+                return entry["value"]
+            cache.misses[source] += 1
+            count("cache_misses", source)
+            validators = {"etag": entry["etag"], "last_modified": entry["last_modified"]} if entry else {}
+            token = _validators.set(validators)
+            try:
+                result = await func(session, city, *args, **kwargs)
+            finally:
+                _validators.reset(token)
+            if result is NOT_MODIFIED:
+                cache.revalidated[source] += 1
+                count("cache_revalidated", source)
+                cache.touch(key)
+                return entry["value"]
+            if _cacheable(result):
+                cache.put(key, source, result, validators.get("etag"), validators.get("last_modified"))
+            return result
+        return wrapper
+    return decorator
+
+def cached_batch(source: str):
+    """Caches fetch_batch(session, cities, ...) results per city; only cities not fresh in the cache are fetched."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(session, cities: List[str], *args, **kwargs):
+            cache = _active_cache
+            if cache is None:
+                return await func(session, cities, *args, **kwargs)
+            results, to_fetch = [], []
+            for city in cities:
+                entry = cache.get(_key(source, city, args, kwargs))
+                if entry is not None and entry["fresh"]:
+                    cache.hits[source] += 1
+                    count("cache_hits", source)
+                    results.append(entry["value"])
+                else:
+                    cache.misses[source] += 1
+                    count("cache_misses", source)
+                    to_fetch.append(city)
+            if to_fetch:
+                fetched = await func(session, to_fetch, *args, **kwargs)
+                for record in fetched:
+                    if _cacheable(record):
+                        cache.put(_key(source, record["city"], args, kwargs), source, record)
+                results.extend(fetched)
+            return results
+        return wrapper
+    return decorator
\ No newline at end of file
@@ -0,0 +1,269 @@
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+import functools
+import contextvars
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+from config import (
+    RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_BUDGET, BREAKER_FAILURES, BREAKER_RESET
+)
+from utils.metrics import count
+
+# Statuses worth another attempt; other 4xx responses will not change on a retry
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+_attempt = contextvars.ContextVar("attempt", default=1)
+
+class HttpStatusError(Exception):
+    """A response with a status the caller cannot use; retry_after is the server's Retry-After in seconds, if any."""
+    def __init__(self, status: int, host: str, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status} from {host}")
+        self.status = status
+        self.host = host
+        self.retry_after = retry_after
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose circuit breaker is open."""
+
+def current_attempt() -> int:
+    """The attempt number (1 for the first call) of the retried call running in this task."""
+    return _attempt.get()
+
+def retry_after(resp, default: Optional[float] = None) -> Optional[float]:
+    """Seconds from a response's Retry-After header, given as seconds or an HTTP date."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+def raise_for_transient(resp):
+    """Raises HttpStatusError, with the Retry-After, if the response status is worth retrying (429, 5xx)."""
+    if resp.status in TRANSIENT_STATUSES or resp.status >= 500:
+        raise HttpStatusError(resp.status, resp.url.host, retry_after(resp))
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    True for failures that may clear on their own: timeouts, dropped
+    connections, 429 and 5xx responses, I/O errors of outputs other than
+    missing files or permissions, and a SQLite database locked by a reader.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (HttpStatusError, aiohttp.ClientResponseError)):
+        return exc.status in TRANSIENT_STATUSES or exc.status >= 500
+    if isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return True
+    if isinstance(exc, (PermissionError, FileNotFoundError, IsADirectoryError, NotADirectoryError)):
+        return False
+    if isinstance(exc, sqlite3.OperationalError):
+        return "locked" in str(exc) or "busy" in str(exc)
+    return isinstance(exc, OSError)
+
+class RetryBudget:
+    """
+    Retries left for the whole run, shared by every source and output.
+
+    When a provider is down, each city would otherwise spend its own retries
+    on it; the budget caps the total. None means unlimited.
+    """
+    def __init__(self, limit: Optional[int] = RETRY_BUDGET):
+        self.limit = limit
+        self.spent = 0
+        self.denied = 0
+
+    def spend(self) -> bool:
+        if self.limit is not None and self.spent >= self.limit:
+            self.denied += 1
+            return False
+        self.spent += 1
+        return True
+
+    def reset(self):
+        self.spent = 0
+        self.denied = 0
+
+class CircuitBreaker:
+    """
+    Consecutive transient failures of one host.
+
+    After failure_threshold failures in a row the circuit opens: calls fail
+    fast with CircuitOpenError for reset_timeout seconds. Then a single trial
+    call is let through (half-open); its success closes the circuit, its
+    failure opens it again. A trial that ends without an answer either way
+    (cancelled) is released, so the next call becomes the trial.
+    """
+    def __init__(self, host: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if not self._trial and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._trial = True
+            return True
+        self.rejected += 1
+        return False
+
+    @property
+    def testing(self) -> bool:
+        """True while the half-open trial call is in flight."""
+        return self._trial
+
+    def release(self):
+        self._trial = False
+
+    def success(self):
+        if self.opened_at is not None:
+            logging.info(f"Circuit for {self.host} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened += 1
+            self.opened_at = time.monotonic()
+            self._trial = False
+            logging.warning(
+                f"Circuit for {self.host} opened after {self.failures} consecutive failures, "
+                f"failing fast for {self.reset_timeout:.0f}s"
+            )
+
+class RetryPolicy:
+    """
+    Retries transient failures with exponential backoff and full jitter.
+
+    Attempt n waits a random time between 0 and min(max_delay, base_delay *
+    2**(n-1)), so clients that failed together do not retry in lockstep. A
+    Retry-After from the server is honoured as the minimum wait; one longer
+    than max_delay is not waited for. Permanent errors are raised at once.
+    Every retry is paid from the run's RetryBudget, and each host (or output)
+    has a CircuitBreaker that stops calling it after repeated failures.
+    """
+    def __init__(
+        self,
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+        budget: Optional[RetryBudget] = None,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_timeout: float = BREAKER_RESET,
+        classify: Callable[[BaseException], bool] = is_transient
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.classify = classify
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+        return self.breakers[host]
+
+    def delay(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the server asks for longer than max_delay."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        wait = getattr(exc, "retry_after", None)
+        if wait is None:
+            return backoff
+        return max(wait, backoff) if wait <= self.max_delay else None
+
+    async def call(self, host: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        name = getattr(func, "__qualname__", str(func))
+        breaker = self.breaker(host)
+        for attempt in range(1, self.attempts + 1):
+            if not breaker.allow():
+                count("circuit_rejections", host)
+                raise CircuitOpenError(f"Circuit for {host} is open, not calling {name}")
+            token = _attempt.set(attempt)
+            trial = breaker.testing
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if not self.classify(e):
+                    # The host answered, so it is up; the request or its response is at fault
+                    breaker.success()
+                    raise
+                breaker.failure()
+                if attempt == self.attempts:
+                    logging.error(f"All {self.attempts} attempts failed for {name}: {e}")
+                    raise
+                wait = self.delay(attempt, e)
+                if wait is None:
+                    logging.error(f"{host} asked to retry {name} after more than {self.max_delay:.0f}s, giving up: {e}")
+                    raise
+                if not self.budget.spend():
+                    count("retries_denied", host)
+                    logging.error(f"Retry budget of {self.budget.limit} exhausted, giving up on {name}: {e}")
+                    raise
+                count("retries", host)
+                logging.warning(f"Retry {attempt}/{self.attempts - 1} for {name} in {wait:.2f}s due to error: {e}")
+                await asyncio.sleep(wait)
+            except BaseException:
+                # Cancelled mid-call: the trial proved nothing either way
+                if trial:
+                    breaker.release()
+                raise
+            else:
+                breaker.success()
+                return result
+            finally:
+                _attempt.reset(token)
+
+    def log(self):
+        logging.info(
+            f"Retries: {self.budget.spent} spent, {self.budget.denied} denied by the budget of {self.budget.limit}"
+        )
+        for breaker in self.breakers.values():
+            if breaker.opened:
+                logging.info(f"Circuit for {breaker.host}: opened {breaker.opened} times, {breaker.rejected} calls failed fast")
+
+_active_policy: Optional[RetryPolicy] = None
+_default_policy: Optional[RetryPolicy] = None
+
+def use_retry_policy(policy: Optional[RetryPolicy]):
+    """Sets the policy used by retrying fetches and outputs; None falls back to a default policy."""
+    global _active_policy
+    _active_policy = policy
+
+def retry_policy() -> RetryPolicy:
+    global _default_policy
+    if _active_policy is not None:
+        return _active_policy
+    if _default_policy is None:
+        _default_policy = RetryPolicy()
+    return _default_policy
+
+def retrying(host: str):
+    """Runs an async function under the active RetryPolicy; host names its circuit breaker."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await retry_policy().call(host, func, *args, **kwargs)
+        return wrapper
+    return decorator
\ No newline at end of file
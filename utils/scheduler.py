@@ -0,0 +1,183 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+from yarl import URL
+from config import HOST_LIMITS, DEFAULT_HOST_LIMITS
+from utils.retry import retry_after, retry_policy
+from utils.metrics import count
+
+class HostLimiter:
+    """
+    Token bucket and adaptive concurrency window for a single host.
+
+    The bucket caps the request rate at the provider's quota. The concurrency
+    window grows by one slot per window's worth of fast, successful responses and
+    halves on 429s, 5xx responses, errors or latency above twice the target
+    (AIMD), so a slow or failing host backs off without starving other hosts.
+    """
+    def __init__(
+        self,
+        host: str,
+        rate: float,
+        burst: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        target_latency: float = 1.0
+    ):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.busy_time = 0.0
+        self.first_request = None
+        self.last_response = None
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._slots = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._take_token()
+        except BaseException:
+            await self._free_slot()
+            raise
+        if self.first_request is None:
+            self.first_request = time.monotonic()
+
+    async def release(self, latency: float, status: Optional[int] = None, error: bool = False):
+        now = time.monotonic()
+        self.requests += 1
+        self.busy_time += latency
+        self.last_response = now
+        if error or status == 429 or (status is not None and status >= 500):
+            self.errors += 1
+            self._decrease(now)
+        elif latency > 2 * self.target_latency:
+            self._decrease(now)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        await self._free_slot()
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for seconds, e.g. after a 429 with Retry-After."""
+        self.throttled += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def log_throughput(self):
+        if not self.requests:
+            return
+        elapsed = max((self.last_response or 0) - (self.first_request or 0), 1e-9)
+        logging.info(
+            f"Host {self.host}: {self.requests} requests in {elapsed:.2f}s "
+            f"({self.requests / elapsed:.1f} req/s, avg latency {self.busy_time / self.requests:.3f}s), "
+            f"{self.errors} errors, {self.throttled} throttled, concurrency limit {int(self.limit)}"
+        )
+
+    def _decrease(self, now: float):
+        # Halve at most once per target latency so one burst of failures is a single decrease
+        if now - self._last_decrease >= self.target_latency:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self._last_decrease = now
+
+    async def _free_slot(self):
+        async with self._slots:
+            self.in_flight -= 1
+            self._slots.notify_all()
+
+    async def _take_token(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostScheduler:
+    """Hands out a HostLimiter per host, configured from HOST_LIMITS or DEFAULT_HOST_LIMITS."""
+    def __init__(self, limits: Dict[str, Dict[str, Any]] = HOST_LIMITS, default: Dict[str, Any] = DEFAULT_HOST_LIMITS):
+        self.limits = limits
+        self.default = default
+        self.limiters: Dict[str, HostLimiter] = {}
+
+    def limiter_for(self, url) -> HostLimiter:
+        url = URL(str(url))
+        authority = f"{url.host}:{url.port}"
+        if authority not in self.limiters:
+            settings = self.limits.get(authority) or self.limits.get(url.host) or self.default
+            self.limiters[authority] = HostLimiter(authority, **settings)
+        return self.limiters[authority]
+
+    def log_throughput(self):
+        for limiter in self.limiters.values():
+            limiter.log_throughput()
+
+class _ScheduledRequest:
+    def __init__(self, session: "ScheduledSession", method: str, url, kwargs):
+        self._session = session
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._limiter = session.scheduler.limiter_for(url)
+        self._resp = None
+        self._start = 0.0
+
+    async def __aenter__(self):
+        for attempt in range(self._session.max_throttle_retries + 1):
+            await self._limiter.acquire()
+            self._start = time.monotonic()
+            try:
+                resp = await self._session.session.request(self._method, self._url, **self._kwargs)
+            except BaseException:
+                await self._limiter.release(time.monotonic() - self._start, error=True)
+                raise
+            # Throttle retries are paid from the run's retry budget like any other retry
+            if resp.status == 429 and attempt < self._session.max_throttle_retries and retry_policy().budget.spend():
+                delay = retry_after(resp, 1.0)
+                resp.release()
+                await self._limiter.release(time.monotonic() - self._start, status=429)
+                self._limiter.pause(delay)
+                count("throttled", self._limiter.host)
+                logging.warning(f"Throttled by {self._limiter.host}, retrying in {delay:.1f}s")
+                continue
+            self._resp = resp
+            return resp
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._resp.release()
+        await self._limiter.release(time.monotonic() - self._start, status=self._resp.status, error=exc_type is not None)
+
+class ScheduledSession:
+    """
+    Wraps an aiohttp.ClientSession so every request goes through a HostScheduler.
+
+    Exposes the same get() used by the input sources. A 429 pauses the host for
+    its Retry-After and the request is retried, up to max_throttle_retries times.
+    """
+    def __init__(self, session, scheduler: Optional[HostScheduler] = None, max_throttle_retries: int = 3):
+        self.session = session
+        self.scheduler = scheduler or HostScheduler()
+        self.max_throttle_retries = max_throttle_retries
+
+    def get(self, url, **kwargs) -> _ScheduledRequest:
+        return _ScheduledRequest(self, "GET", url, kwargs)
+
+    def request(self, method: str, url, **kwargs) -> _ScheduledRequest:
+        return _ScheduledRequest(self, method, url, kwargs)
\ No newline at end of file
@@ -0,0 +1,240 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+CATEGORY = "category"
+FLOAT32 = "float32"
+DATETIME = "datetime64[us]"
+
+# Typed schema of source records and history rows. Missing values stay typed
+# (NaN, NaT, a missing category); "NA" is only written by the outputs.
+# Categories are always kept sorted, so sorting by a categorical column
+# orders rows exactly as sorting the strings would.
+RECORD_SCHEMA: Dict[str, str] = {
+    "city": CATEGORY,
+    "temp_k": FLOAT32,
+    "humidity": FLOAT32,
+    "wind_speed": FLOAT32,
+    "description": CATEGORY,
+    "feels_like": FLOAT32,
+    "source": CATEGORY,
+    "timestamp": DATETIME,
+    "aqi": FLOAT32,
+    "aqi_open_meteo": FLOAT32,
+}
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # "NA" from older cached records and any other junk
+        return np.nan
+
+def _parse_datetimes(values) -> pd.Series:
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', format='ISO8601', utc=True)
+    return parsed.dt.tz_localize(None).astype(DATETIME)
+
+class RecordBatch:
+    """
+    Columnar builder for source records.
+
+    Records are appended straight into preallocated NumPy arrays, one per
+    field: measurements into float32 with NaN for anything missing or
+    unparseable, categorical fields as int32 codes into a growing list of
+    categories, timestamps as text that is parsed in one vectorised pass by
+    to_frame(). Fields outside RECORD_SCHEMA are kept as objects.
+    """
+    def __init__(self, fields: Sequence[str], capacity: int = 1024):
+        self.fields = list(fields)
+        self._size = 0
+        self._capacity = max(1, capacity)
+        self._columns = {field: self._allocate(field, self._capacity) for field in self.fields}
+        self._categories: Dict[str, Dict[Any, int]] = {
+            field: {} for field in self.fields if RECORD_SCHEMA.get(field) == CATEGORY
+        }
+        self._kinds = [(field, RECORD_SCHEMA.get(field)) for field in self.fields]
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _allocate(field: str, capacity: int) -> np.ndarray:
+        kind = RECORD_SCHEMA.get(field)
+        if kind == FLOAT32:
+            return np.full(capacity, np.nan, dtype=np.float32)
+        if kind == CATEGORY:
+            return np.full(capacity, -1, dtype=np.int32)
+        return np.full(capacity, None, dtype=object)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        for field, values in self._columns.items():
+            grown = self._allocate(field, capacity)
+            grown[:self._size] = values[:self._size]
+            self._columns[field] = grown
+        self._capacity = capacity
+
+    def append(self, record: Dict[str, Any]):
+        if self._size == self._capacity:
+            self._grow()
+        row = self._size
+        columns = self._columns
+        for field, kind in self._kinds:
+            value = record.get(field)
+            if value is None:
+                # Preallocated as missing
+                continue
+            if kind == FLOAT32:
+                columns[field][row] = _to_float(value)
+            elif kind == CATEGORY:
+                if value == value:
+                    categories = self._categories[field]
+                    code = categories.get(value)
+                    if code is None:
+                        code = categories[value] = len(categories)
+                    columns[field][row] = code
+            else:
+                columns[field][row] = value
+        self._size += 1
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> "RecordBatch":
+        """Appends many records a column at a time, converting each column in one vectorised pass."""
+        records = list(records)
+        while self._size + len(records) > self._capacity:
+            self._grow()
+        rows = slice(self._size, self._size + len(records))
+        for field, kind in self._kinds:
+            values = [record.get(field) for record in records]
+            if kind == FLOAT32:
+                self._columns[field][rows] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+            elif kind == CATEGORY:
+                codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+                categories = self._categories[field]
+                known = [categories.setdefault(value, len(categories)) for value in uniques]
+                self._columns[field][rows] = np.append(np.asarray(known, dtype=np.int32), -1)[codes]
+            else:
+                column = self._columns[field]
+                for row, value in enumerate(values, start=self._size):
+                    column[row] = value
+        self._size += len(records)
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        columns = {}
+        for field, values in self._columns.items():
+            values = values[:self._size]
+            kind = RECORD_SCHEMA.get(field)
+            if kind == CATEGORY:
+                seen = np.array(list(self._categories[field]), dtype=object)
+                order = np.argsort(seen, kind='stable')
+                # Codes were handed out in order of appearance; map them onto the sorted categories
+                remap = np.empty(len(seen) + 1, dtype=np.int32)
+                remap[order] = np.arange(len(seen), dtype=np.int32)
+                remap[-1] = -1
+                columns[field] = pd.Categorical.from_codes(remap[values], categories=pd.Index(seen[order], dtype=object))
+            elif kind == DATETIME:
+                columns[field] = _parse_datetimes(values).to_numpy()
+            else:
+                columns[field] = values.copy()
+        return pd.DataFrame(columns, columns=self.fields)
+
+def conform(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Casts the columns of df that are in RECORD_SCHEMA to their typed form,
+    after reindexing to columns if given. Missing columns come out typed too.
+    """
+    df = df.copy(deep=False) if columns is None else df.reindex(columns=columns)
+    for col in df.columns:
+        kind = RECORD_SCHEMA.get(col)
+        if kind is None:
+            continue
+        if kind == CATEGORY:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype) or not df[col].cat.categories.is_monotonic_increasing:
+                df[col] = pd.Categorical(df[col].astype(object), categories=_categories(df[col]))
+        elif df[col].dtype == kind:
+            continue
+        elif kind == FLOAT32:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+        elif pd.api.types.is_datetime64_any_dtype(df[col]) and getattr(df[col].dt, 'tz', None) is None:
+            df[col] = df[col].astype(DATETIME)
+        else:
+            df[col] = _parse_datetimes(df[col]).to_numpy()
+    return df
+
+def _categories(values: pd.Series) -> pd.Index:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.categories
+    return pd.Index(np.unique(np.asarray(values.dropna(), dtype=object)), dtype=object)
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat that keeps categorical columns categorical.
+
+    Frames read or built separately have different categories, and pandas
+    falls back to object columns when they differ; the categories are
+    unioned first so the result stays compact.
+    """
+    frames = list(frames)
+    categorical = [
+        col for col in dict.fromkeys(col for frame in frames for col in frame.columns)
+        if any(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames if col in frame.columns)
+    ]
+    for col in categorical:
+        present = [frame[col] for frame in frames if col in frame.columns]
+        dtype = pd.CategoricalDtype(pd.Index(np.unique(np.concatenate(
+            [np.asarray(_categories(values), dtype=object) for values in present]
+        )), dtype=object))
+        frames = [
+            frame.assign(**{col: _recode(frame[col], dtype)}) if col in frame.columns else frame
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+def _recode(values: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.set_categories(dtype.categories)
+    return values.astype(object).astype(dtype)
+
+def widen(values) -> np.ndarray:
+    """
+    float32 values as float64, keeping the decimal each float32 stands for.
+
+    A plain cast turns 12.3 into 12.300000190734863. Values are rounded to the
+    7 significant digits float32 carries instead, and the few that do not
+    round-trip to the same float32 go through their shortest repr.
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return values.astype(np.float64)
+    wide = values.astype(np.float64)
+    finite = np.isfinite(wide) & (wide != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = 10.0 ** (6 - np.floor(np.log10(np.abs(wide[finite]))))
+    rounded = np.round(wide[finite] * scale) / scale
+    exact = rounded.astype(np.float32) == values[finite]
+    rounded[~exact] = values[finite][~exact].astype(str).astype(np.float64)
+    wide[finite] = rounded
+    return wide
+
+def output_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The output edge: timestamps become ISO text (as datetime.isoformat writes
+    it) and categoricals plain objects. Missing values stay missing, for the
+    outputs to render as "NA".
+    """
+    converted = {}
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            converted[col] = values.astype(object)
+        elif pd.api.types.is_datetime64_dtype(values):
+            converted[col] = _iso_strings(values.to_numpy(dtype='datetime64[us]'))
+    return df.assign(**converted) if converted else df
+
+def _iso_strings(stamps: np.ndarray) -> np.ndarray:
+    text = np.datetime_as_string(stamps, unit='us').astype(object)
+    whole = stamps == stamps.astype('datetime64[s]')
+    text[whole] = np.datetime_as_string(stamps[whole], unit='s')
+    text[np.isnat(stamps)] = np.nan
+    return text
\ No newline at end of file
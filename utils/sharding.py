@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.schema import concat_frames
+
+# A frame in shared memory: segment name, IPC stream size, columns Arrow cannot type, column order
+Handle = Tuple[str, int, Dict[str, np.ndarray], List[str]]
+
+def put_frame(df: pd.DataFrame) -> Handle:
+    """
+    Writes df as an Arrow IPC stream into a new shared memory segment.
+
+    Typed columns cross the process boundary as Arrow buffers in shared memory
+    instead of pickled Python objects sent through a pipe. Columns Arrow cannot
+    type, such as object columns mixing strings and numbers, are passed
+    through as NumPy arrays. Categoricals travel as dictionary arrays. The reader owns the segment and unlinks it (see take_frame).
+    """
+    import pyarrow as pa
+
+    arrays, names, leftovers = [], [], {}
+    for name in df.columns:
+        try:
+            arrays.append(pa.array(df[name], from_pandas=True))
+            names.append(name)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            leftovers[name] = df[name].to_numpy()
+    table = pa.Table.from_arrays(arrays, names=names)
+    size = _write_stream(pa.MockOutputStream(), table)
+    shm = SharedMemory(create=True, size=size)
+    try:
+        buffer = pa.py_buffer(shm.buf)
+        _write_stream(pa.FixedSizeBufferWriter(buffer), table)
+        # Arrow must drop its view of the segment before it can be closed
+        del buffer
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, size, leftovers, list(df.columns)
+
+def take_frame(handle: Handle, unlink: bool = True) -> pd.DataFrame:
+    """Reads a frame written by put_frame, copying it out of shared memory and unlinking the segment."""
+    import pyarrow as pa
+
+    name, size, leftovers, columns = handle
+    shm = SharedMemory(name=name)
+    try:
+        data = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    df = pa.ipc.open_stream(data).read_all().to_pandas()
+    for column, values in leftovers.items():
+        df[column] = values
+    return df[columns]
+
+def discard_frame(handle: Handle):
+    try:
+        shm = SharedMemory(name=handle[0])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+def _write_stream(sink, table) -> int:
+    import pyarrow as pa
+
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.tell()
+
+def _transform_shard(handle: Handle, transformers: Sequence[Callable]) -> Tuple[Handle, List[str]]:
+    """Worker entry point: runs the transformer chain on one shard and returns it in a new segment, with any errors."""
+    # The parent unlinks its own segment once every shard has come back
+    df = take_frame(handle, unlink=False)
+    errors = []
+    for transformer in transformers:
+        try:
+            df = transformer(df)
+        except Exception as e:
+            errors.append(f"Transformer {getattr(transformer, '__name__', str(transformer))} failed: {e}")
+    return put_frame(df), errors
+
+def shard_positions(cities: pd.Series, shards: int) -> List[np.ndarray]:
+    """
+    Splits row positions into at most shards groups, keeping each city in one group.
+
+    Cities are assigned largest first to the group with the fewest rows so far,
+    which keeps the groups close in size when a few cities dominate.
+    """
+    codes, uniques = pd.factorize(cities, use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    shards = max(1, min(shards, len(uniques)))
+    loads = np.zeros(shards, dtype=np.int64)
+    shard_of_city = np.empty(len(uniques), dtype=np.int64)
+    for city in np.argsort(-counts, kind='stable'):
+        target = int(np.argmin(loads))
+        shard_of_city[city] = target
+        loads[target] += counts[city]
+    shard_of_row = shard_of_city[codes]
+    return [np.flatnonzero(shard_of_row == shard) for shard in range(shards)]
+
+class ShardedExecutor:
+    """
+    Runs the transformer chain on city shards in a pool of worker processes.
+
+    The frame is split into one shard per worker with every city kept whole.
+    Shards travel as Arrow IPC streams in shared memory and the transformed
+    shards are put back in the original row order. Encoding and reassembly run
+    in a thread, so the event loop stays free while the workers are busy.
+    """
+    def __init__(self, workers: int, min_rows: int = 0):
+        self.workers = workers
+        self.min_rows = min_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def accepts(self, df: pd.DataFrame) -> bool:
+        """True if df is large enough for the process round trip to pay off."""
+        return len(df) >= self.min_rows and 'city' in df.columns
+
+    async def transform(self, df: pd.DataFrame, transformers: Sequence[Callable]) -> pd.DataFrame:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        positions = shard_positions(df['city'], self.workers)
+        handles = await asyncio.to_thread(lambda: [put_frame(df.iloc[rows]) for rows in positions])
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._pool, _transform_shard, handle, list(transformers)) for handle in handles),
+                return_exceptions=True
+            )
+        finally:
+            for handle in handles:
+                discard_frame(handle)
+        failed = [result for result in results if isinstance(result, BaseException)]
+        if failed:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    discard_frame(result[0])
+            raise failed[0]
+        for _, errors in results:
+            for error in errors:
+                logging.error(error)
+        return await asyncio.to_thread(self._reassemble, df.index, positions, [handle for handle, _ in results])
+
+    @staticmethod
+    def _reassemble(index: pd.Index, positions: List[np.ndarray], handles: List[Handle]) -> pd.DataFrame:
+        frames = [take_frame(handle) for handle in handles]
+        for rows, frame in zip(positions, frames):
+            if len(frame) != len(rows):
+                raise ValueError(f"A transformer changed the row count of a shard ({len(rows)} -> {len(frame)})")
+        df = concat_frames(frames)
+        df = df.iloc[np.argsort(np.concatenate(positions), kind='stable')]
+        df.index = index
+        return df
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
\ No newline at end of file